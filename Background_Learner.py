@@ -0,0 +1,202 @@
+import time
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from RandomFrozenLake import RandomFrozenLake
+from Q_Learner import QLearner
+
+"""
+File:   Background_Learner.py
+Author: Koutounidis Christos-Angelos
+Description: Q-learning in a separate process, for the GUI. The learner publishes the agent's
+             state, the Q-table and the policy into a block of multiprocessing.shared_memory,
+             guarded by a sequence counter (seqlock): the counter is odd while a snapshot is
+             being written, so the reader copies the block and retries if the counter changed
+             in between. The pygame loop only reads the latest snapshot, so a slow frame or
+             a window drag never stalls the learning, and the learning never freezes the window.
+"""
+
+HEADER_FIELDS = 8       # sequence, state index, episodes, tables version (+ spare)
+# Steps between two checks of the stop event (the publish interval is checked at the end of every episode)
+STOP_CHECK_EVERY = 1024
+
+
+class SharedSnapshot:
+    def __init__(self, n_states, name=None):
+        """
+        Shared block with the header, the last episode's reward, the Q-table (float32) and the
+        policy. The GUI creates it (name=None) and the learner process attaches to it by name.
+        """
+        q_bytes = n_states * 4 * 4
+        size = HEADER_FIELDS * 8 + 8 + q_bytes + n_states * 8
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.name = self.shm.name
+        buffer = self.shm.buf
+        self.header = np.ndarray(HEADER_FIELDS, dtype=np.int64, buffer=buffer)
+        self.reward = np.ndarray(1, dtype=np.float64, buffer=buffer, offset=HEADER_FIELDS * 8)
+        self.Q = np.ndarray((n_states, 4), dtype=np.float32, buffer=buffer, offset=HEADER_FIELDS * 8 + 8)
+        self.policy = np.ndarray(n_states, dtype=np.int64, buffer=buffer, offset=HEADER_FIELDS * 8 + 8 + q_bytes)
+
+    def publish(self, state_index, episodes, reward=None, Q=None, policy=None):
+        """
+        Writer side (a single writer): the agent's state and episode count, and optionally the
+        last episode's reward and new Q-table and policy
+        """
+        header = self.header
+        header[0] += 1          # Odd: snapshot being written
+        header[1] = state_index
+        header[2] = episodes
+        if reward is not None:
+            self.reward[0] = reward
+        if Q is not None:
+            self.Q[:] = Q
+            self.policy[:] = policy
+            header[3] += 1
+        header[0] += 1          # Even: snapshot consistent
+
+    def read(self, tables_version=-1, timeout=None):
+        """
+        Reader side: consistent copy of the latest snapshot.
+        Returns (state_index, episodes, reward, tables_version, Q, policy), where Q and policy
+        are None if the tables haven't changed since the given version.
+        :param timeout: seconds after which a TimeoutError is raised if no consistent snapshot
+                        was read (e.g. the writer was killed in the middle of a publication)
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            if deadline is not None and time.perf_counter() > deadline:
+                raise TimeoutError("no consistent snapshot in the shared memory")
+            sequence = int(self.header[0])
+            if sequence & 1:
+                time.sleep(0)
+                continue
+            state_index, episodes, version = (int(value) for value in self.header[1:4])
+            reward = float(self.reward[0])
+            if version != tables_version:
+                Q, policy = self.Q.copy(), self.policy.copy()
+            else:
+                Q = policy = None
+            if int(self.header[0]) == sequence:
+                return state_index, episodes, reward, version, Q, policy
+
+    def close(self, unlink=False):
+        # The NumPy views have to go before the shared memory can be closed
+        self.header = self.reward = self.Q = self.policy = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def run_learner(name, spec, settings, Q, seed, stop, publish_interval):
+    """
+    Learner process: plays and learns on its own copy of the map (same dynamics and update
+    as agent_plays_game, including the infinite loop breaker) until stop is set.
+    :param spec: map of the GUI's environment {"n", "goal", "holes", "slip"}
+    :param settings: (gamma, alpha, bonus, planning_steps)
+    :param Q: initial Q-values
+    :param publish_interval: minimum seconds between two publications of the Q-table
+    """
+    env = RandomFrozenLake(n=spec["n"], seed=seed)
+    env.goal, env.slip = spec["goal"], spec["slip"]
+    env.holes = spec["holes"]
+    env.compile_model()
+    gamma, alpha, bonus, planning_steps = settings
+    learner = QLearner(env, gamma, alpha, bonus, planning_steps=planning_steps)
+    learner.seed_from_values(Q)
+    snapshot = SharedSnapshot(learner.n_states, name)
+
+    visits = np.zeros(learner.n_states, dtype=np.int64)
+    state_index = env.start[0] * env.n + env.start[1]
+    total_reward = 0.0
+    episodes = 0
+    steps = 0
+    published = time.perf_counter()
+    while True:
+        visits[state_index] += 1
+        action = learner.choose_action(state_index, visits[state_index])
+        next_state, reward, done = env.step(action)
+        next_state_index = next_state[0] * env.n + next_state[1]
+        learner.update(state_index, action, reward, next_state_index)
+        if learner.planner is not None:
+            learner.planner.observe(state_index, action, env.last_action, reward)
+            learner.planner.plan()
+        total_reward += reward
+        steps += 1
+        if done:
+            episodes += 1
+            env.reset()
+            learner.policy = learner.greedy_policy()
+            visits[:] = 0
+            state_index = env.start[0] * env.n + env.start[1]
+            now = time.perf_counter()
+            if now - published >= publish_interval:
+                snapshot.publish(state_index, episodes, total_reward, learner.Q, learner.policy)
+                published = now
+            else:
+                snapshot.publish(state_index, episodes, total_reward)
+            total_reward = 0.0
+        else:
+            state_index = next_state_index
+            snapshot.publish(state_index, episodes)
+        if steps % STOP_CHECK_EVERY == 0 and stop.is_set():
+            break
+    # Final tables, for the policy cache
+    snapshot.publish(state_index, episodes, Q=learner.Q, policy=learner.greedy_policy())
+    snapshot.close()
+
+
+class BackgroundLearner:
+    def __init__(self, env, learner, publish_interval=1 / 60):
+        """
+        Starts the learner process on the environment's map, from the learner's current
+        Q-values and settings
+        :param env: RandomFrozenLake environment (with its holes generated)
+        :param learner: QLearner already seeded with the initial best moves
+        :param publish_interval: minimum seconds between two publications of the Q-table
+        """
+        context = multiprocessing.get_context("spawn")    # No fork of the pygame process
+        self.snapshot = SharedSnapshot(learner.n_states)
+        self.snapshot.publish(env.start[0] * env.n + env.start[1], 0, 0.0, learner.Q, learner.policy)
+        self.stop_event = context.Event()
+        spec = {"n": env.n, "goal": env.goal, "holes": env.holes, "slip": env.slip}
+        planning_steps = 0 if learner.planner is None else learner.planner.planning_steps
+        settings = (learner.gamma, learner.alpha, learner.bonus, planning_steps)
+        seed = int(env.rng.integers(2 ** 63))
+        self.process = context.Process(target=run_learner, daemon=True, name="BackgroundLearner",
+                                       args=(self.snapshot.name, spec, settings, learner.Q, seed,
+                                             self.stop_event, publish_interval))
+        self.process.start()
+        # Last tables read, returned by stop() if the final ones can't be read
+        self.Q, self.policy = learner.Q.copy(), learner.policy.copy()
+
+    def read(self, tables_version=-1):
+        """
+        Latest snapshot of the learner, see SharedSnapshot.read
+        """
+        if not self.process.is_alive():
+            raise RuntimeError(f"the background learner exited with code {self.process.exitcode}")
+        # The writer can't stay inside a publication for a second, unless it died in it
+        snapshot = self.snapshot.read(tables_version, timeout=1)
+        if snapshot[4] is not None:
+            self.Q, self.policy = snapshot[4], snapshot[5]
+        return snapshot
+
+    def stop(self, timeout=5):
+        """
+        Stops the learner process and returns its final Q-table and policy. If the process had to
+        be terminated, it may have been killed in the middle of a publication, so the last
+        tables read before are returned instead.
+        """
+        self.stop_event.set()
+        self.process.join(timeout)
+        Q, policy = self.Q, self.policy
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        else:
+            try:
+                _, _, _, _, Q, policy = self.snapshot.read(timeout=timeout)
+            except TimeoutError:
+                pass
+        self.snapshot.close(unlink=True)
+        return Q, policy
@@ -0,0 +1,199 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")   # Headless: no window is ever shown
+import sys
+import json
+import time
+import argparse
+import platform
+import numpy as np
+import pygame
+from RandomFrozenLake import RandomFrozenLake
+from Visual_Analyzer import GameAnalyzer
+from Board_Renderer import BoardRenderer
+from Q_Learner import QLearner
+
+"""
+File:   Benchmark_Suite.py
+Author: Koutounidis Christos-Angelos
+Description: Headless benchmark suite for the hot paths of the project: step(), generate_holes(),
+             the visual analyzer (on synthetic rendered images), the Q update and the rendering.
+             It runs over grid sizes and slip levels, reports throughput and latency percentiles
+             as JSON, and can compare the results against a saved baseline.
+"""
+
+GRID_SIZES = (5, 10, 15, 22)        # The sizes RandomFrozenLake creates
+STRESS_SIZES = (50, 100)
+SLIPS = (0, 1, 2)
+
+
+def make_env(n, slip, seed=0):
+    """
+    Environment of size n with its holes generated, with the same randomness for the same seed
+    """
+    np.random.seed(seed)     # Randomness of the benchmarks' inputs
+    env = RandomFrozenLake(n=n, seed=seed)
+    env.slip = slip
+    env.holes = env.generate_holes()
+    return env
+
+
+def measure(function, repeats, inner=1):
+    """
+    Times repeats batches of inner calls of the function.
+    Returns the throughput (calls/sec) and the p50/p90/p99 latency of one call in microseconds.
+    """
+    timings = np.empty(repeats)
+    for r in range(repeats):
+        start = time.perf_counter_ns()
+        for _ in range(inner):
+            function()
+        timings[r] = (time.perf_counter_ns() - start) / inner
+    p50, p90, p99 = np.percentile(timings, [50, 90, 99]) / 1000
+    return {"throughput": 1e9 / timings.mean(), "p50_us": p50, "p90_us": p90, "p99_us": p99}
+
+
+def bench_step(env, compiled):
+    if compiled:
+        env.compile_model()
+    else:
+        env.model = None
+    actions = np.random.randint(4, size=1024).tolist()
+    position = [0]
+
+    def step():
+        _, _, done = env.step(actions[position[0] & 1023])
+        position[0] += 1
+        if done:
+            env.reset()
+    env.reset()
+    return step
+
+
+def bench_generate_holes(env):
+    return env.generate_holes
+
+
+def bench_q_update(env):
+    learner = QLearner(env, 0.95, 0.35)
+    n_states = learner.n_states
+    samples = np.random.randint(n_states, size=(1024, 2)).tolist()
+    position = [0]
+
+    def update():
+        state_index, next_state_index = samples[position[0] & 1023]
+        position[0] += 1
+        learner.update(state_index, position[0] & 3, -0.1, next_state_index)
+    return update
+
+
+def render_board(env, cell_size=40):
+    """
+    Renders the board offscreen (synthetic image for the analyzer) and returns the screen and renderer
+    """
+    window_size = ((env.n * cell_size) + 40, (env.n * cell_size + 2) + 40)
+    screen = pygame.display.set_mode(window_size)
+    renderer = BoardRenderer(screen, env, cell_size)
+    for state_index in range(env.n * env.n):
+        env.set_best_move(state_index, np.random.randint(4))
+    renderer.draw()
+    return screen, renderer
+
+
+def bench_analyzer(env):
+    screen, _ = render_board(env)
+    analyzer = GameAnalyzer(env.n, 40)
+    image = np.ascontiguousarray(pygame.surfarray.array3d(screen).transpose(1, 0, 2))
+    elements = analyzer.find_elements(image)
+    return {"find_elements": lambda: analyzer.find_elements(image),
+            "calculate_best_moves": lambda: analyzer.calculate_best_moves(elements),
+            "analyze_surface": lambda: analyzer.analyze_surface(screen)}
+
+
+def bench_render(env):
+    _, renderer = render_board(env)
+    cells = np.random.randint(env.n, size=(1024, 2)).tolist()
+    position = [0]
+
+    def full():
+        renderer.invalidate()
+        renderer.draw()
+
+    def incremental():
+        env.state = tuple(cells[position[0] & 1023])
+        position[0] += 1
+        renderer.draw()
+    return {"render_full": full, "render_incremental": incremental}
+
+
+def run_suite(sizes, slips=SLIPS, repeats=50, seed=0):
+    """
+    Runs every benchmark for every (n, slip) and returns the list of results
+    """
+    pygame.init()
+    results = []
+
+    def record(name, n, slip, function, inner):
+        results.append(dict(name=name, n=n, slip=slip, **measure(function, repeats, inner)))
+
+    for n in sizes:
+        for slip in slips:
+            env = make_env(n, slip, seed)
+            record("step", n, slip, bench_step(env, compiled=False), 100)
+            record("step_compiled", n, slip, bench_step(env, compiled=True), 100)
+            record("generate_holes", n, slip, bench_generate_holes(env), 1)
+            record("q_update", n, slip, bench_q_update(env), 100)
+            # The analyzer and the rendering don't depend on the slip
+            if slip == slips[0]:
+                for name, function in bench_analyzer(env).items():
+                    record(name, n, slip, function, 1)
+                for name, function in bench_render(env).items():
+                    record(name, n, slip, function, 1)
+    pygame.quit()
+    return results
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Compares the throughput with a baseline. Returns the benchmarks that got slower than
+    (1 - tolerance) times their baseline throughput.
+    """
+    previous = {(r["name"], r["n"], r["slip"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get((result["name"], result["n"], result["slip"]))
+        if old is not None:
+            ratio = result["throughput"] / old["throughput"]
+            print(f'{result["name"]:>22} n={result["n"]:<4} slip={result["slip"]}  x{ratio:.2f}')
+            if ratio < 1 - tolerance:
+                regressions.append((result["name"], result["n"], result["slip"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Random Frozen Lake benchmark suite")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file for the results")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed throughput drop vs the baseline")
+    parser.add_argument("--stress", action="store_true", help="also run the large stress sizes")
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    sizes = GRID_SIZES + (STRESS_SIZES if args.stress else ())
+    results = run_suite(sizes, repeats=args.repeats)
+    report = {"meta": {"python": platform.python_version(), "numpy": np.__version__,
+                       "machine": platform.machine(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+              "results": results}
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for name, n, slip, ratio in regressions:
+            print(f"REGRESSION: {name} n={n} slip={slip} at x{ratio:.2f} of the baseline")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
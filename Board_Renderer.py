@@ -0,0 +1,215 @@
+import pygame
+
+"""
+File:   Board_Renderer.py
+Author: Koutounidis Christos-Angelos
+Description: Incremental renderer of the game board. The static board (grid lines, holes, goal
+             and free cells) is baked once into a cached surface, and at every frame only the
+             cells that changed (agent position and arrows) are redrawn and updated on screen.
+             Boards bigger than the window are shown through a viewport that follows the agent.
+"""
+
+white = (255, 255, 255)
+black = (0, 0, 0)
+lilac = (225, 196, 255)
+red = (245, 20, 20)
+blue = (20, 20, 245)
+green = (20, 245, 20)
+
+
+def draw_arrow(screen, direction, cell_rect):
+    """
+    Used to draw the best action to take in each box   ( ↑  ←  ↓  → )
+    """
+    center_x, center_y = cell_rect.center
+    if direction == 0:  # UP arrow
+        pygame.draw.polygon(screen, (0, 0, 0), [
+            (center_x, center_y - 10),
+            (center_x - 5, center_y),
+            (center_x + 5, center_y)
+        ])
+        pygame.draw.line(screen, (0, 0, 0), (center_x, center_y), (center_x, center_y + 5), 2)
+    elif direction == 1:  # LEFT arrow
+        pygame.draw.polygon(screen, (0, 0, 0), [
+            (center_x - 10, center_y),
+            (center_x, center_y - 5),
+            (center_x, center_y + 5)
+        ])
+        pygame.draw.line(screen, (0, 0, 0), (center_x, center_y), (center_x + 5, center_y), 2)
+    elif direction == 2:  # DOWN arrow
+        pygame.draw.polygon(screen, (0, 0, 0), [
+            (center_x, center_y + 10),
+            (center_x - 5, center_y),
+            (center_x + 5, center_y)
+        ])
+        pygame.draw.line(screen, (0, 0, 0), (center_x, center_y), (center_x, center_y - 5), 2)
+    elif direction == 3:  # RIGHT arrow
+        pygame.draw.polygon(screen, (0, 0, 0), [
+            (center_x + 10, center_y),
+            (center_x, center_y - 5),
+            (center_x, center_y + 5)
+        ])
+        pygame.draw.line(screen, (0, 0, 0), (center_x, center_y), (center_x - 5, center_y), 2)
+    else:
+        pass
+
+
+class BoardRenderer:
+    def __init__(self, screen, env, cell_size=40, margin=20, view_cells=None):
+        """
+        :param screen: pygame display surface
+        :param env: RandomFrozenLake environment (with its holes generated)
+        :param cell_size: cell size in pixels
+        :param margin: buffer zone around the grid in pixels
+        :param view_cells: cells per side of the visible part of the board (the whole board by
+                           default). Larger boards are shown through a viewport that follows the agent.
+        """
+        self.screen = screen
+        self.env = env
+        self.cell_size = cell_size
+        self.margin = margin
+        self.view_cells = env.n if view_cells is None else min(view_cells, env.n)
+        self.top = 0        # First visible row and column of the board
+        self.left = 0
+        self.static = self.bake()
+        self.drawn_policy = None
+        self.drawn_state = None
+        self.full_redraw = True
+        self.repainted = set()      # Cells of the static board that changed since the last frame
+
+    def cell_rects(self, i, j):
+        """
+        Outline and fill rectangles of the cell (i, j), relative to the viewport
+        """
+        x = (j - self.left) * self.cell_size + self.margin
+        y = (i - self.top) * self.cell_size + self.margin
+        rect_1 = pygame.Rect(x, y, self.cell_size, self.cell_size)
+        rect_2 = pygame.Rect(x + 1, y + 1, self.cell_size - 2, self.cell_size - 2)
+        return rect_1, rect_2
+
+    def visible(self, i, j):
+        return self.top <= i < self.top + self.view_cells and self.left <= j < self.left + self.view_cells
+
+    def bake(self):
+        """
+        Draws the static board (everything except the agent and the arrows) of the viewport once
+        """
+        static = pygame.Surface(self.screen.get_size())
+        static.fill(white)
+        for i in range(self.top, self.top + self.view_cells):
+            for j in range(self.left, self.left + self.view_cells):
+                self.paint_static(static, i, j)
+        return static
+
+    def paint_static(self, static, i, j):
+        """
+        Draws the cell (i, j) of the static board: goal, hole or free cell
+        """
+        rect_1, rect_2 = self.cell_rects(i, j)
+        pygame.draw.rect(static, black, rect_1, 1)
+        if (i, j) == self.env.goal:
+            pygame.draw.rect(static, red, rect_2)
+        elif self.env.holes[i, j]:
+            pygame.draw.rect(static, blue, rect_2)
+        else:
+            pygame.draw.rect(static, lilac, rect_2)
+
+    def repaint(self, cells):
+        """
+        Updates the static board after some cells of the map changed (dynamic lake). They are
+        redrawn on the next frame, together with the other changed cells.
+        """
+        for i, j in cells:
+            if self.visible(i, j):
+                self.paint_static(self.static, i, j)
+                self.repainted.add(i * self.env.n + j)
+
+    def cell_at(self, position):
+        """
+        The cell (i, j) under a pixel position of the window, or None outside of the board
+        """
+        x, y = position[0] - self.margin, position[1] - self.margin
+        if x < 0 or y < 0:
+            return None
+        i, j = y // self.cell_size, x // self.cell_size
+        if i >= self.view_cells or j >= self.view_cells:
+            return None
+        return self.top + i, self.left + j
+
+    def invalidate(self):
+        """
+        Forces a full redraw on the next frame (e.g. after drawing a message over the board)
+        """
+        self.full_redraw = True
+
+    def follow(self, agent_state):
+        """
+        Moves the viewport when the agent gets close to its border (within a quarter of it),
+        centering it on the agent. The static board of the new viewport is baked again.
+        """
+        if self.view_cells == self.env.n:
+            return
+        i, j = divmod(agent_state, self.env.n)
+        edge = self.view_cells // 4
+        limit = self.env.n - self.view_cells
+        top, left = self.top, self.left
+        if not top + edge <= i < top + self.view_cells - edge:
+            top = min(max(i - self.view_cells // 2, 0), limit)
+        if not left + edge <= j < left + self.view_cells - edge:
+            left = min(max(j - self.view_cells // 2, 0), limit)
+        if (top, left) != (self.top, self.left):
+            self.top, self.left = top, left
+            self.static = self.bake()
+            self.full_redraw = True
+
+    def draw_cell(self, state_index, agent_state):
+        """
+        Redraws one (visible) cell from the static board, with the agent and its arrow on top.
+        Returns the rectangle that changed.
+        """
+        i, j = divmod(state_index, self.env.n)
+        _, rect_2 = self.cell_rects(i, j)
+        self.screen.blit(self.static, rect_2, rect_2)
+        if state_index == agent_state:
+            pygame.draw.rect(self.screen, green, rect_2)
+            # Arrows for the best move in the cell we are at, at the moment
+            draw_arrow(self.screen, self.env.best_move_per_cell[state_index], rect_2)
+        elif (i, j) != self.env.goal and not self.env.holes[i, j]:
+            # Arrows for the best move in each cell (not including holes and goal since they are END states)
+            draw_arrow(self.screen, self.env.best_move_per_cell[state_index], rect_2)
+        return rect_2
+
+    def draw(self):
+        """
+        Renders the current game state. Only the visible cells whose arrow changed, and the
+        agent's previous and current cells, are redrawn and updated on screen, so the cost of a
+        frame doesn't depend on the size of the board.
+        """
+        env = self.env
+        agent_state = None if env.done else env.state[0] * env.n + env.state[1]
+        if agent_state is not None:
+            self.follow(agent_state)
+        rows = slice(self.top, self.top + self.view_cells)
+        cols = slice(self.left, self.left + self.view_cells)
+        policy = env.best_move_per_cell.reshape(env.grid_size)[rows, cols].copy()
+
+        if self.full_redraw:
+            self.screen.blit(self.static, (0, 0))
+            for i in range(rows.start, rows.stop):
+                for j in range(cols.start, cols.stop):
+                    self.draw_cell(i * env.n + j, agent_state)
+            pygame.display.flip()
+            self.full_redraw = False
+        else:
+            changed_rows, changed_cols = (policy != self.drawn_policy).nonzero()
+            changed = set(((changed_rows + self.top) * env.n + changed_cols + self.left).tolist())
+            for state_index in (self.drawn_state, agent_state):
+                if state_index is not None and self.visible(*divmod(state_index, env.n)):
+                    changed.add(state_index)
+            changed |= self.repainted
+            rects = [self.draw_cell(state_index, agent_state) for state_index in changed]
+            pygame.display.update(rects)
+
+        self.drawn_policy = policy
+        self.drawn_state = agent_state
+        self.repainted.clear()
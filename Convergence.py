@@ -0,0 +1,126 @@
+import time
+from collections import deque
+import numpy as np
+
+"""
+File:   Convergence.py
+Author: Koutounidis Christos-Angelos
+Description: Convergence detection of the Q-learning, so that the game and the batch jobs can
+             stop learning as soon as it is done. After every episode the monitor checks the
+             enabled criteria: the greedy policy didn't change for K episodes, the max change
+             of the Q-values over the episode is below ε, or the moving average of the rewards
+             stopped moving (plateau). It reports the criterion met and the episodes and time
+             it took to converge.
+"""
+
+
+class ConvergenceMonitor:
+    def __init__(self, stable_episodes=None, q_tolerance=None, plateau_window=None, plateau_tolerance=0.5):
+        """
+        Any of the enabled criteria is enough for convergence.
+        :param stable_episodes: K, the greedy policy didn't change for K episodes
+        :param q_tolerance: ε, the max |ΔQ| over an episode is below ε
+        :param plateau_window: W, the mean reward of the last W episodes differs from the mean
+                               of the W before them by less than plateau_tolerance
+        :param plateau_tolerance: see plateau_window
+        """
+        if stable_episodes is None and q_tolerance is None and plateau_window is None:
+            raise ValueError("at least one convergence criterion is needed")
+        self.stable_episodes = stable_episodes
+        self.q_tolerance = q_tolerance
+        self.plateau_window = plateau_window
+        self.plateau_tolerance = plateau_tolerance
+        self.started = None
+
+    def start(self, policy=None, Q=None):
+        """
+        Starts the clock and the episode count, from the initial policy and Q-values if given
+        (otherwise the first episode counts as a change of the policy)
+        """
+        self.started = time.perf_counter()
+        self.episodes = 0
+        self.last_change = 0        # Episodes played when the policy last changed
+        self.changed_at = self.started  # and the time of that change
+        self.policy = None if policy is None else np.array(policy)
+        self.Q = None if Q is None or self.q_tolerance is None else np.array(Q)
+        self.max_change = np.inf    # Max |ΔQ| of the last episode
+        self.rewards = deque(maxlen=2 * self.plateau_window if self.plateau_window else 1)
+        self.converged = False
+        self.criterion = None
+        self.episodes_to_convergence = None
+        self.seconds_to_convergence = None
+        self.detected_after = None  # Episodes played when the convergence was detected
+        self.seconds_to_detection = None
+
+    def update(self, policy, Q, reward):
+        """
+        Called after every episode with the new greedy policy, the Q-values (only used by the
+        q_tolerance criterion) and the total reward of the episode.
+        Returns True once the learning has converged.
+        """
+        if self.started is None:
+            self.start()
+        self.episodes += 1
+        now = time.perf_counter()
+        if self.policy is None or not np.array_equal(policy, self.policy):
+            self.last_change = self.episodes
+            self.changed_at = now
+            self.policy = np.array(policy)
+        if self.q_tolerance is not None:
+            if self.Q is not None:
+                self.max_change = float(np.abs(Q - self.Q).max())
+                np.copyto(self.Q, Q)
+            else:
+                self.Q = np.array(Q)
+        self.rewards.append(reward)
+        if self.converged:
+            return True
+
+        if self.stable_episodes is not None and self.episodes - self.last_change >= self.stable_episodes:
+            # Converged at the last change of the policy, detected stable_episodes later
+            self._converge("policy", self.last_change, self.changed_at, now)
+        elif self.q_tolerance is not None and self.max_change < self.q_tolerance:
+            self._converge("q_values", self.episodes, now, now)
+        elif self.plateau_window is not None and len(self.rewards) == self.rewards.maxlen:
+            rewards = np.fromiter(self.rewards, dtype=float)
+            window = self.plateau_window
+            if abs(rewards[window:].mean() - rewards[:window].mean()) < self.plateau_tolerance:
+                self._converge("reward", self.episodes, now, now)
+        return self.converged
+
+    def _converge(self, criterion, episodes, converged_at, detected_at):
+        """
+        :param episodes: episodes played at the convergence
+        :param converged_at: time of the convergence (after those episodes)
+        :param detected_at: time of the detection (after all the episodes played so far)
+        """
+        self.converged = True
+        self.criterion = criterion
+        self.episodes_to_convergence = episodes
+        self.seconds_to_convergence = converged_at - self.started
+        self.detected_after = self.episodes
+        self.seconds_to_detection = detected_at - self.started
+
+    def summary(self):
+        """
+        Criterion met (None if not converged), episodes and seconds to convergence, and
+        episodes played so far
+        """
+        return {"converged": self.converged, "criterion": self.criterion,
+                "episodes_to_convergence": self.episodes_to_convergence,
+                "seconds_to_convergence": self.seconds_to_convergence,
+                "detected_after": self.detected_after, "seconds_to_detection": self.seconds_to_detection,
+                "episodes": 0 if self.started is None else self.episodes}
+
+    def report(self):
+        """
+        One line description of the convergence, for the terminal
+        """
+        if not self.converged:
+            return f"Not converged after {self.summary()['episodes']} episodes"
+        reason = {"policy": f"the policy didn't change for {self.stable_episodes} episodes",
+                  "q_values": f"max |ΔQ| below {self.q_tolerance}",
+                  "reward": f"reward plateau over {self.plateau_window} episodes"}[self.criterion]
+        return (f"Converged after {self.episodes_to_convergence} episodes "
+                f"in {self.seconds_to_convergence:.2f} s ({reason}, "
+                f"detected after {self.detected_after} episodes in {self.seconds_to_detection:.2f} s)")
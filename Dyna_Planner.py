@@ -0,0 +1,142 @@
+import heapq
+import numpy as np
+from Offline_Learner import next_state_table
+
+"""
+File:   Dyna_Planner.py
+Author: Koutounidis Christos-Angelos
+Description: Model-based planning for the Q-learner (Dyna-Q with prioritized sweeping).
+             The planner counts the observed outcomes of every (state, action): the REAL
+             action taken after the slip and the reward. Between two real steps it replays
+             this empirical model with a budget of backups
+             Q[s,a] = (k Q0[s,a] + Σ(r + γ max Q[s'])) / (k + visits)
+             always on the (state, action) with the largest TD error first (priority queue),
+             and queues the predecessors of every changed state. So the values found at the
+             goal and at the holes spread back along the lake in far fewer real episodes.
+             The initial (seeded) Q-values Q0 count as k observations of every move, so a
+             move seen only once or twice (e.g. a single slip into a hole) doesn't replace
+             the solver's values with a one-sample estimate.
+"""
+
+PLANNING_STEPS = 20         # Backups between two real steps
+PRIORITY_THRESHOLD = 1e-3   # Smaller TD errors aren't queued
+PRIOR_VISITS = 20           # Observations the initial Q-values are worth in the backups
+
+
+class DynaPlanner:
+    def __init__(self, learner, planning_steps=PLANNING_STEPS, threshold=PRIORITY_THRESHOLD,
+                 prior_visits=PRIOR_VISITS):
+        """
+        :param learner: QLearner whose Q-table is planned on (updated in place). Its Q-values are
+                        taken here as the initial ones, and again by refresh() when it is seeded.
+        :param planning_steps: maximum backups per call of plan()
+        :param threshold: minimum TD error for a (state, action) to be queued
+        :param prior_visits: weight of the initial Q-values in the backups, in observations
+        """
+        self.learner = learner
+        self.planning_steps = planning_steps
+        self.threshold = threshold
+        self.prior_visits = prior_visits
+        self.next_state = next_state_table(learner.env.n).tolist()   # [n*n, 4] per REAL action
+        # Empirical model: (state, inputed action) -> [visits, reward sum, {next state: count}]
+        self.model = {}
+        self.predecessors = [set() for _ in range(learner.n_states)]  # state -> {(state, action)} leading to it
+        self.V = None               # max Q of every state, as floats
+        self.prior = None           # Initial Q-values [n*n][4], as floats
+        self.queue = []             # Heap of (-priority, state, action)
+        self.queued = {}            # (state, action) -> priority of its live heap entry
+        self.backups = 0
+        self.refresh()
+
+    def observe(self, state_index, action, actual, reward):
+        """
+        Adds a real transition (after the Q-learner's own update) to the model and queues its
+        (state, action)
+        :param action: inputed action
+        :param actual: REAL action taken (after the slip)
+        """
+        Q = self.learner.Q
+        self.V[state_index] = float(Q[state_index].max())
+        self.learner.policy[state_index] = Q[state_index].argmax()
+        next_state_index = self.next_state[state_index][actual]
+        key = (state_index, action)
+        entry = self.model.get(key)
+        if entry is None:
+            entry = self.model[key] = [0, 0.0, {}]
+        entry[0] += 1
+        entry[1] += reward
+        entry[2][next_state_index] = entry[2].get(next_state_index, 0) + 1
+        self.predecessors[next_state_index].add(key)
+        self._queue(state_index, action)
+
+    def forget(self, states):
+        """
+        Drops the observed outcomes of the given states (e.g. after the map changed around them)
+        """
+        for state_index in np.asarray(states).tolist():
+            for action in range(4):
+                key = (state_index, action)
+                entry = self.model.pop(key, None)
+                if entry is not None:
+                    for next_state_index in entry[2]:
+                        self.predecessors[next_state_index].discard(key)
+                    self.queued.pop(key, None)
+
+    def refresh(self, states=None):
+        """
+        Takes again the values of the given states (all by default), after their Q-values changed
+        outside of the learner's update (e.g. seeding, replanning of the dynamic lake). They are
+        also their new initial values.
+        """
+        Q = self.learner.Q
+        if states is None:
+            self.V = Q.max(axis=1).tolist()
+            self.prior = Q.tolist()
+            return
+        states = np.asarray(states)
+        for state_index, values in zip(states.tolist(), Q[states].tolist()):
+            self.V[state_index] = max(values)
+            self.prior[state_index] = values
+
+    def expected_target(self, state_index, action):
+        """
+        mean(r + γ max Q[s']) over the observed outcomes of the (state, action), with the
+        initial Q-value counted as prior_visits more outcomes
+        """
+        visits, reward_sum, outcomes = self.model[(state_index, action)]
+        V = self.V
+        return ((self.prior_visits * self.prior[state_index][action] + reward_sum
+                 + self.learner.gamma * sum(count * V[s] for s, count in outcomes.items()))
+                / (self.prior_visits + visits))
+
+    def _queue(self, state_index, action):
+        priority = abs(self.expected_target(state_index, action) - self.learner.Q[state_index, action])
+        key = (state_index, action)
+        if priority > self.threshold and priority > self.queued.get(key, 0):
+            # A lower entry of the same key already in the heap becomes stale
+            self.queued[key] = priority
+            heapq.heappush(self.queue, (-priority, state_index, action))
+
+    def plan(self, planning_steps=None):
+        """
+        Backups of the queued (state, action) pairs, highest TD error first.
+        Returns the number of backups done.
+        """
+        planning_steps = self.planning_steps if planning_steps is None else planning_steps
+        Q, policy = self.learner.Q, self.learner.policy
+        queue, queued = self.queue, self.queued
+        backups = 0
+        while queue and backups < planning_steps:
+            priority, state_index, action = heapq.heappop(queue)
+            key = (state_index, action)
+            if queued.get(key) != -priority:
+                continue        # Stale entry
+            del queued[key]
+            Q[state_index, action] = self.expected_target(state_index, action)
+            self.V[state_index] = float(Q[state_index].max())
+            policy[state_index] = Q[state_index].argmax()
+            backups += 1
+            for predecessor in self.predecessors[state_index]:
+                self._queue(*predecessor)
+        self.backups += backups
+        return backups
@@ -0,0 +1,139 @@
+import numpy as np
+from VectorFrozenLake import MOVES
+
+"""
+File:   Dynamic_Lake.py
+Author: Koutounidis Christos-Angelos
+Description: Dynamic lake mode: cells of the ice can melt into holes, holes can freeze over and
+             the goal can move in the middle of a session. After every change only the rows
+             of the compiled model next to the changed cells are recomputed, and the Q-values
+             are repaired with Bellman backups that start at the changed cells and spread out
+             only as long as the values keep changing. The Q-table, the policy and
+             best_move_per_cell stay valid without a full solve, so the cost of replanning
+             depends on the size of the change and not on n^2.
+"""
+
+REPLAN_TOLERANCE = 1e-4     # Value changes smaller than this don't spread further
+
+
+def neighbourhood(states, n):
+    """
+    The states and their 4 neighbours (flat indices, without duplicates)
+    """
+    rows, cols = np.divmod(np.asarray(states, dtype=np.int64), n)
+    near_rows = np.clip(rows[:, None] + MOVES[:, 0], 0, n - 1)
+    near_cols = np.clip(cols[:, None] + MOVES[:, 1], 0, n - 1)
+    return np.unique(np.concatenate((rows * n + cols, (near_rows * n + near_cols).ravel())))
+
+
+def local_backups(model, Q, gamma, states, tol=REPLAN_TOLERANCE, max_sweeps=100000):
+    """
+    Q(s,a) = Σ P(s'|s,a) (r + γ max Q(s')) on the given states, then on the neighbours of every
+    state whose value changed by more than tol, until nothing changes. The Q-rows of the final
+    (END) states are kept at 0, as in the exact solvers.
+    :param Q: Q-values [n*n, 4], updated in place
+    :return: flat indices of the states whose Q-values were backed up
+    """
+    terminal = model.terminal
+    frontier = np.asarray(states, dtype=np.int64)
+    frontier = frontier[~terminal[frontier]]
+    touched = [frontier]
+    for _ in range(max_sweeps):
+        if not frontier.size:
+            break
+        targets = (model.rewards[frontier] + gamma * Q[model.next_state[frontier]].max(axis=-1)) @ model.probabilities
+        old_values = Q[frontier].max(axis=1)
+        Q[frontier] = targets
+        changed = frontier[np.abs(Q[frontier].max(axis=1) - old_values) > tol]
+        frontier = neighbourhood(changed, model.n)
+        frontier = frontier[~terminal[frontier]]
+        touched.append(frontier)
+    return np.unique(np.concatenate(touched))
+
+
+class DynamicLake:
+    def __init__(self, env, learner=None, gamma=None, tol=REPLAN_TOLERANCE):
+        """
+        :param env: RandomFrozenLake environment (with its holes generated)
+        :param learner: QLearner whose Q-table and policy are kept valid. Without one, the exact
+                        solver's Q-values are computed once and repaired after every change.
+        :param gamma: discount factor of the backups (the learner's or the environment's by default)
+        :param tol: value changes smaller than this don't spread further
+        """
+        self.env = env
+        self.learner = learner
+        self.tol = tol
+        if env.model is None:
+            env.compile_model()
+        if learner is not None:
+            self.gamma = learner.gamma if gamma is None else gamma
+            self.Q = learner.Q
+        else:
+            from Policy_Solver import value_iteration
+            self.gamma = env.gamma if gamma is None else gamma
+            _, _, self.Q = value_iteration(env, self.gamma)
+            self.Q = np.ascontiguousarray(self.Q)
+            env.best_move_per_cell[:] = self.Q.argmax(axis=1).tolist()
+        self.changes = 0
+        self.replanned = 0      # Backed up states of the last change
+
+    def melt(self, cells):
+        """
+        The ice of the given cells melts into holes
+        """
+        return self._change(self._cells(cells), hole=True)
+
+    def freeze(self, cells):
+        """
+        The holes of the given cells freeze over (become walkable ice)
+        """
+        return self._change(self._cells(cells), hole=False)
+
+    def move_goal(self, cell):
+        """
+        Moves the goal to another cell of the ice
+        """
+        env = self.env
+        cell = tuple(int(x) for x in cell)
+        if env.holes[cell]:
+            raise ValueError(f"the goal can't move into the hole {cell}")
+        if cell == env.start:
+            raise ValueError("the goal can't move to the start")
+        old_goal = env.goal
+        env.goal = cell
+        return self._replan([old_goal, cell])
+
+    def _cells(self, cells):
+        cells = [tuple(int(x) for x in cell) for cell in np.asarray(cells).reshape(-1, 2)]
+        for cell in cells:
+            if cell in (self.env.start, self.env.goal):
+                raise ValueError(f"the start and the goal {cell} can't change")
+        return cells
+
+    def _change(self, cells, hole):
+        rows, cols = np.asarray(cells, dtype=np.int64).reshape(-1, 2).T
+        self.env.holes[rows, cols] = hole
+        return self._replan(cells)
+
+    def _replan(self, cells):
+        """
+        Recompiles the model around the changed cells and repairs the Q-values, the learner's
+        policy and best_move_per_cell. Returns the flat indices of the backed up states.
+        """
+        env, Q = self.env, self.Q
+        model = env.model
+        states = model.update_cells(cells, env.holes, env.goal)
+        Q[states[model.terminal[states]]] = 0     # New final (END) states
+        if self.learner is not None and self.learner.planner is not None:
+            # The observed outcomes around the changed cells are out of date
+            self.learner.planner.forget(states)
+        touched = local_backups(model, Q, self.gamma, states, self.tol)
+        policy = Q[touched].argmax(axis=1)
+        if self.learner is not None:
+            self.learner.policy[touched] = policy
+            if self.learner.planner is not None:
+                self.learner.planner.refresh(np.union1d(states, touched))
+        env.best_move_per_cell[touched] = policy.tolist()
+        self.changes += 1
+        self.replanned = len(touched)
+        return touched
@@ -0,0 +1,167 @@
+import numpy as np
+from VectorFrozenLake import GOAL_REWARD
+from Random_Stream import BLOCK_SIZE
+try:
+    from numba import njit
+except ImportError:     # QLearner keeps its pure-Python episodes
+    njit = None
+
+"""
+File:   Episode_Kernel.py
+Author: Koutounidis Christos-Angelos
+Description: Optional Numba-compiled kernel for the headless Q-learning. It runs whole episodes
+             over the compiled map's tables, with the same dynamics as RandomFrozenLake.step(),
+             the same infinite loop breaker and the same update as agent_plays_game, rounded
+             like the float32 Q-table of QLearner. The slip and exploration uniforms come from
+             the environment's own streams, so the episodes are the same as the pure-Python
+             ones of QLearner.run_episode for the same seed.
+"""
+
+NUMBA_AVAILABLE = njit is not None
+
+# carry: state index, steps, episode, slip position, explore position, loop breaks
+STATE, STEPS, EPISODE, SLIP_POSITION, EXPLORE_POSITION, LOOP_BREAKS = range(6)
+
+
+def episodes_kernel(next_state, rewards, done, cumulative, Q, policy, visits, start_index, loop_breaker,
+                    gamma32, alpha, goal_reward, max_steps, slip_uniforms, explore_uniforms, carry, total,
+                    out_rewards, out_steps, out_goals, out_visited, out_loop_breaks):
+    """
+    Plays episodes until len(out_rewards) of them are done (returns 0), or until the slip
+    (returns 1) or exploration (returns 2) uniforms run out. The episode in progress is
+    kept in carry and total, so the call can continue with new uniforms.
+    """
+    n_states = Q.shape[0]
+    state_index = carry[STATE]
+    steps = carry[STEPS]
+    episode = carry[EPISODE]
+    slip_position = carry[SLIP_POSITION]
+    explore_position = carry[EXPLORE_POSITION]
+    loop_breaks = carry[LOOP_BREAKS]
+    total_reward = total[0]
+    status = 0
+    while episode < out_rewards.shape[0]:
+        if slip_position == slip_uniforms.shape[0]:
+            status = 1
+            break
+        state_visits = visits[state_index] + 1
+        action = policy[state_index]
+        # Infinite loop breaker: a random other direction becomes the best move
+        if loop_breaker and state_visits > 5:
+            if explore_position == explore_uniforms.shape[0]:
+                status = 2
+                break
+            other = int(explore_uniforms[explore_position] * 3)
+            explore_position += 1
+            action = other if other < action else other + 1
+            policy[state_index] = action
+            loop_breaks += 1
+        visits[state_index] = state_visits
+
+        # Slip outcome (same rule as np.random.choice) and table-lookup step
+        draw = slip_uniforms[slip_position]
+        slip_position += 1
+        k = 0
+        while k < 2 and cumulative[k] <= draw:
+            k += 1
+        next_index = next_state[state_index, action, k]
+        reward = rewards[state_index, action, k]
+
+        # Q_new = Q_old + α(reward + γ(max(Q_next_state)) - Q_old)
+        best = Q[next_index, 0]
+        for a in range(1, 4):
+            if Q[next_index, a] > best:
+                best = Q[next_index, a]
+        old = np.float64(Q[state_index, action])
+        Q[state_index, action] = old + alpha * (reward + np.float64(gamma32 * best) - old)
+        total_reward += reward
+        steps += 1
+
+        if done[state_index, action, k] or steps == max_steps:
+            out_rewards[episode] = total_reward
+            out_steps[episode] = steps
+            out_goals[episode] = done[state_index, action, k] and reward == goal_reward
+            out_loop_breaks[episode] = loop_breaks
+            # Greedy policy rebuilt from the Q-values, and the visit counts cleared
+            visited = 0
+            for s in range(n_states):
+                if visits[s] > 0:
+                    visited += 1
+                    visits[s] = 0
+                b = 0
+                for a in range(1, 4):
+                    if Q[s, a] > Q[s, b]:
+                        b = a
+                policy[s] = b
+            out_visited[episode] = visited
+            episode += 1
+            state_index = start_index
+            steps = 0
+            total_reward = 0.0
+            loop_breaks = 0
+        else:
+            state_index = next_index
+
+    carry[STATE] = state_index
+    carry[STEPS] = steps
+    carry[EPISODE] = episode
+    carry[SLIP_POSITION] = slip_position
+    carry[EXPLORE_POSITION] = explore_position
+    carry[LOOP_BREAKS] = loop_breaks
+    total[0] = total_reward
+    return status
+
+
+if NUMBA_AVAILABLE:
+    episodes_kernel = njit(cache=True, nogil=True)(episodes_kernel)
+
+
+def run_episodes(learner, episodes, max_steps, block_size=BLOCK_SIZE):
+    """
+    Plays episodes of a QLearner with the kernel (compiled, or plain Python without Numba).
+    Updates the learner's Q-table and policy in place and returns the total reward of every
+    episode, like calling learner.run_episode episodes times.
+    """
+    env = learner.env
+    model = env.model if env.model is not None else env.compile_model()
+    if learner.Q.dtype != np.float32 or not learner.Q.flags.c_contiguous:
+        learner.Q = np.ascontiguousarray(learner.Q, dtype=np.float32)
+    learner.policy = np.ascontiguousarray(learner.policy, dtype=np.int64)
+    start_index = env.start[0] * env.n + env.start[1]
+    visits = np.zeros(learner.n_states, dtype=np.int64)
+    carry = np.zeros(6, dtype=np.int64)
+    carry[STATE] = start_index
+    total = np.zeros(1)
+    out_rewards = np.empty(episodes)
+    out_steps = np.empty(episodes, dtype=np.int64)
+    out_goals = np.empty(episodes, dtype=np.bool_)
+    out_visited = np.empty(episodes, dtype=np.int64)
+    out_loop_breaks = np.empty(episodes, dtype=np.int64)
+
+    slip_uniforms = env.slip_draws.take(block_size)
+    explore_uniforms = env.explore_draws.take(block_size)
+    while True:
+        status = episodes_kernel(model.next_state, model.rewards, model.done, model.cumulative_probabilities,
+                                 learner.Q, learner.policy, visits, start_index, env.slip == 0,
+                                 np.float32(learner.gamma), float(learner.alpha), float(GOAL_REWARD), max_steps,
+                                 slip_uniforms, explore_uniforms, carry, total,
+                                 out_rewards, out_steps, out_goals, out_visited, out_loop_breaks)
+        if status == 0:
+            break
+        if status == 1:
+            slip_uniforms = env.slip_draws.take(block_size)
+            carry[SLIP_POSITION] = 0
+        else:
+            explore_uniforms = env.explore_draws.take(block_size)
+            carry[EXPLORE_POSITION] = 0
+    # The uniforms that weren't used go back to the streams
+    env.slip_draws.push_back(slip_uniforms[carry[SLIP_POSITION]:])
+    env.explore_draws.push_back(explore_uniforms[carry[EXPLORE_POSITION]:])
+
+    if episodes:
+        learner.reached_goal = bool(out_goals[-1])
+        learner.loop_breaks = int(out_loop_breaks[-1])
+    for episode in range(episodes):
+        env.metrics.record_episode(int(out_steps[episode]), out_rewards[episode],
+                                   int(out_visited[episode]), int(out_loop_breaks[episode]))
+    return out_rewards
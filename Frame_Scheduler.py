@@ -0,0 +1,61 @@
+import time
+import pygame
+
+"""
+File:   Frame_Scheduler.py
+Author: Koutounidis Christos-Angelos
+Description: Fixed-timestep scheduler that decouples the simulation (learning steps) from the
+             rendering. Normally it runs one step per frame at the target FPS. In turbo mode it
+             runs as many steps as fit into each frame budget and then renders one snapshot.
+"""
+
+
+class FrameScheduler:
+    def __init__(self, target_fps=40, turbo=False, learning_share=0.9):
+        """
+        :param target_fps: frames per second of the GUI
+        :param turbo: run as many learning steps as fit into each frame (instead of 1 per frame)
+        :param learning_share: part of the frame budget given to learning in turbo mode
+        """
+        self.target_fps = target_fps
+        self.turbo = turbo
+        self.frame_budget = learning_share / target_fps
+        self.clock = pygame.time.Clock()
+        self.paused_until = 0
+        self.steps = 0
+
+    def hold(self, milliseconds):
+        """
+        Pauses the simulation (not the event handling) for some time, e.g. to show a message.
+        Ignored in turbo mode.
+        """
+        if not self.turbo:
+            self.paused_until = pygame.time.get_ticks() + milliseconds
+
+    def paused(self):
+        return pygame.time.get_ticks() < self.paused_until
+
+    def run_frame(self, step):
+        """
+        Runs the simulation part of one frame and returns the number of steps done.
+        :param step: function doing one learning step
+        """
+        if self.paused():
+            return 0
+        if not self.turbo:
+            step()
+            self.steps += 1
+            return 1
+        steps = 0
+        deadline = time.perf_counter() + self.frame_budget
+        while time.perf_counter() < deadline:
+            step()
+            steps += 1
+        self.steps += steps
+        return steps
+
+    def tick(self):
+        """
+        Waits for the end of the frame, so that the loop runs at the target FPS
+        """
+        return self.clock.tick(self.target_fps)
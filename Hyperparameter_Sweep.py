@@ -0,0 +1,102 @@
+import json
+import numpy as np
+from Q_Learner import QLearner, DEFAULT_SETTINGS, TUNED_SETTINGS_PATH
+from Training_Farm import build_env
+
+"""
+File:   Hyperparameter_Sweep.py
+Author: Koutounidis Christos-Angelos
+Description: Hyperparameter sweep for the per-slip Q-learning settings (γ, α and the initial
+             Q bonus of the suggested moves). The configurations are evaluated on a population
+             of maps with Successive Halving: the bad ones are dropped after a few episodes and
+             only the best ones are trained further. The result is a table of tuned defaults
+             per slip level, that play_game loads.
+"""
+
+
+def sample_configs(count, seed=None):
+    """
+    Random configurations, plus the hand-picked defaults of each slip level
+    """
+    rng = np.random.default_rng(seed)
+    configs = [dict(settings) for settings in DEFAULT_SETTINGS.values()]
+    for _ in range(count - len(configs)):
+        configs.append({"gamma": round(float(rng.uniform(0.5, 0.99)), 3),
+                        "alpha": round(float(rng.uniform(0.05, 0.8)), 3),
+                        "bonus": float(rng.choice([0, 1, 5, 10, 20, 50]))})
+    return configs
+
+
+def make_learner(env, config, policy_source):
+    """
+    Q-learner with the given configuration, initialized like the agent of play_game
+    :param policy_source: "solver" (the exact solver's Q-values for the configuration's γ, as
+                          agent_plays_game seeds them) or "zero" (all Q = 0)
+    """
+    learner = QLearner(env, config["gamma"], config["alpha"], config["bonus"])
+    if policy_source == "solver":
+        from Policy_Solver import value_iteration
+        _, _, Q_optimal = value_iteration(env, config["gamma"])
+        learner.seed_from_values(Q_optimal)
+    return learner
+
+
+def successive_halving(configs, envs, min_episodes=20, max_episodes=640, eta=2, seed=0, policy_source="solver"):
+    """
+    Successive Halving over the configurations. At each rung every surviving configuration is
+    trained (continuing from where it stopped) up to the rung's episodes on every map, and only
+    the best 1/eta of them go to the next rung, with eta times more episodes.
+    All the configurations play a (map, rung) with the same random streams, so they are
+    compared on the same slips and not on different luck.
+    The score is the mean reward of the episodes played in the last rung.
+    :return: list of (config, score, episodes) of the last rung of every configuration, best first
+    """
+    learners = [[make_learner(env, config, policy_source) for env in envs] for config in configs]
+    results = {}
+    alive = list(range(len(configs)))
+    played = 0
+    budget = min_episodes
+    rung = 0
+    while True:
+        for i in alive:
+            rewards = []
+            for m, learner in enumerate(learners[i]):
+                # Common random numbers: every configuration gets the same stream on a (map, rung)
+                rung_seed = int(np.random.SeedSequence([seed, m, rung]).generate_state(1)[0])
+                learner.env.seed_dynamics(rung_seed)
+                max_steps = 100 * learner.n_states
+                rewards.extend(learner.run_episode(max_steps) for _ in range(budget - played))
+            results[i] = (configs[i], float(np.mean(rewards)), budget)
+        alive.sort(key=lambda i: results[i][1], reverse=True)
+        if budget >= max_episodes or len(alive) == 1:
+            break
+        alive = alive[:max(1, len(alive) // eta)]
+        played = budget
+        budget = min(budget * eta, max_episodes)
+        rung += 1
+    return sorted(results.values(), key=lambda result: (result[2], result[1]), reverse=True)
+
+
+def sweep(slips=(0, 1, 2), n_maps=8, n_configs=32, seed=0, policy_source="solver", **halving_options):
+    """
+    Tunes the settings of every slip level on its own population of maps.
+    :param policy_source: initialization of the learners, the one of the agent that will use the table
+    :return: table {slip: {"gamma", "alpha", "bonus", "score", "policy_source"}}
+    """
+    table = {}
+    for slip in slips:
+        map_seeds = np.random.SeedSequence([seed, slip]).generate_state(n_maps)
+        envs = [build_env(int(map_seed), slip) for map_seed in map_seeds]
+        configs = sample_configs(n_configs, seed=[seed, slip])
+        best, score, _ = successive_halving(configs, envs, seed=seed, policy_source=policy_source,
+                                            **halving_options)[0]
+        table[slip] = dict(best, score=score, policy_source=policy_source)
+    return table
+
+
+def save_tuned_defaults(table, path=TUNED_SETTINGS_PATH):
+    """
+    Writes the table of tuned defaults, in the format that load_settings (Q_Learner.py) reads
+    """
+    with open(path, "w") as file:
+        json.dump({str(slip): settings for slip, settings in table.items()}, file, indent=4)
@@ -0,0 +1,101 @@
+import csv
+import json
+import time
+from contextlib import contextmanager, nullcontext
+
+"""
+File:   Instrumentation.py
+Author: Koutounidis Christos-Angelos
+Description: Opt-in instrumentation of the game sessions. It records the wall time and the number
+             of calls of each phase (rendering, analyzer stages, step, Q update, waiting) and
+             per-episode statistics, and exports them to JSON/CSV or passes them to a callback.
+"""
+
+
+class Instrumentation:
+    def __init__(self, callback=None):
+        """
+        :param callback: optional function called as callback(kind, data) for every finished
+                         episode (kind "episode") and every finished phase (kind "phase")
+        """
+        self.callback = callback
+        self.phases = {}        # name -> [calls, total seconds]
+        self.episodes = []
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Times the code inside the with block as one call of the phase
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(name, time.perf_counter() - start)
+
+    def record_phase(self, name, seconds):
+        stats = self.phases.setdefault(name, [0, 0.0])
+        stats[0] += 1
+        stats[1] += seconds
+        if self.callback is not None:
+            self.callback("phase", {"phase": name, "seconds": seconds})
+
+    def record_episode(self, length, reward, states_visited, loop_breaks):
+        """
+        :param length: number of steps of the episode
+        :param reward: total reward of the episode
+        :param states_visited: number of different states visited
+        :param loop_breaks: times the infinite loop breaker (state visited > 5 times) fired
+        """
+        episode = {"episode": len(self.episodes), "length": length, "reward": float(reward),
+                   "states_visited": states_visited, "loop_breaks": loop_breaks}
+        self.episodes.append(episode)
+        if self.callback is not None:
+            self.callback("episode", episode)
+
+    def summary(self):
+        """
+        Calls, total and mean time of every phase, and the recorded episodes
+        """
+        phases = {name: {"calls": calls, "total_seconds": total, "mean_seconds": total / calls}
+                  for name, (calls, total) in self.phases.items()}
+        return {"wall_seconds": time.perf_counter() - self.started, "phases": phases, "episodes": self.episodes}
+
+    def export_json(self, path):
+        with open(path, "w") as file:
+            json.dump(self.summary(), file, indent=2)
+
+    def export_csv(self, phases_path, episodes_path=None):
+        """
+        Writes the phases (and optionally the episodes) as CSV files
+        """
+        with open(phases_path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["phase", "calls", "total_seconds", "mean_seconds"])
+            for name, stats in self.summary()["phases"].items():
+                writer.writerow([name, stats["calls"], stats["total_seconds"], stats["mean_seconds"]])
+        if episodes_path is not None:
+            with open(episodes_path, "w", newline="") as file:
+                writer = csv.DictWriter(file, ["episode", "length", "reward", "states_visited", "loop_breaks"])
+                writer.writeheader()
+                writer.writerows(self.episodes)
+
+
+class NullInstrumentation:
+    """
+    Used when the instrumentation is off: every phase is a shared no-op context
+    """
+    _context = nullcontext()
+
+    def phase(self, name):
+        return self._context
+
+    def record_phase(self, name, seconds):
+        pass
+
+    def record_episode(self, length, reward, states_visited, loop_breaks):
+        pass
+
+
+NO_INSTRUMENTATION = NullInstrumentation()
@@ -0,0 +1,185 @@
+import numpy as np
+
+"""
+File:   Map_Generator.py
+Author: Koutounidis Christos-Angelos
+Description: Fast generation of solvable Random Frozen Lake maps. The holes are sampled in one
+             vectorized draw (without replacement) and the maps are checked with a flood fill,
+             so the goal is always reachable from the start. It can also write big datasets of
+             maps to disk, for the benchmark and training jobs to stream.
+"""
+
+
+def map_dtype(hole_bytes):
+    """
+    Record of one map in a dataset (holes as a packed bitmask of the n x n grid, row-major)
+    """
+    return np.dtype([('n', np.uint16), ('goal', np.uint16, 2), ('slip', np.uint8), ('holes', np.uint8, hole_bytes)])
+
+
+def holes_count(n, slip):
+    """
+    Number of holes based on the slipperiness of the environment
+    """
+    if slip == 0:
+        return int(n * (n / 5))         # holes are (n^2)/5
+    elif slip == 1:
+        return int(n * (n / 7.5))       # holes are (n^2)/7.5
+    return int((n ** (3 / 2)) / 2)      # holes are (n^(3/2))/2.5
+
+
+def random_goal(n, rng=np.random):
+    """
+    Random goal cell, far enough from the start (same rule as RandomFrozenLake)
+    """
+    far, near = int(np.ceil(n / 2)), int(n / 4)
+    far_coord = far + int(rng.choice(n - far))
+    near_coord = near + int(rng.choice(n - near))
+    if rng.random() <= 0.5:
+        return far_coord, near_coord
+    return near_coord, far_coord
+
+
+def sample_holes(n, holes_num, start, goal, rng=np.random):
+    """
+    Samples all the holes in one draw without replacement (never on the start or the goal).
+    Returns a boolean n x n grid.
+    """
+    cells = np.delete(np.arange(n * n), [start[0] * n + start[1], goal[0] * n + goal[1]])
+    hole_grid = np.zeros(n * n, dtype=bool)
+    hole_grid[rng.choice(cells, size=min(holes_num, len(cells)), replace=False)] = True
+    return hole_grid.reshape(n, n)
+
+
+def run_ids(free):
+    """
+    Id of the row run (free cells between two holes) of every cell, flat in row-major order
+    """
+    breaks = ~free
+    breaks[:, 0] = True         # Every row starts a new run
+    return np.cumsum(breaks.ravel())
+
+
+def is_reachable(hole_grid, start, goal):
+    """
+    Flood fill check: True if the goal can be reached from the start without falling in a hole
+    """
+    free = ~np.asarray(hole_grid, dtype=bool)
+    n_rows, n_cols = free.shape
+    flat_free = free.ravel()
+    row_runs = run_ids(free)
+    col_runs = run_ids(np.ascontiguousarray(free.T)).reshape(n_cols, n_rows).T.ravel()
+    reached = np.zeros(free.size, dtype=bool)
+    start_index = start[0] * n_cols + start[1]
+    goal_index = goal[0] * n_cols + goal[1]
+    reached[start_index] = flat_free[start_index]
+    # Filling whole row runs and then whole column runs until it stops changing, so the number
+    # of passes depends on the turns of the path and not on its length
+    count = -1
+    while not reached[goal_index]:
+        for runs in (row_runs, col_runs):
+            hit = np.zeros(runs[-1] + 1, dtype=bool)
+            hit[runs[reached]] = True
+            reached = hit[runs] & flat_free
+        if np.count_nonzero(reached) == count:
+            return False
+        count = np.count_nonzero(reached)
+    return True
+
+
+def repair(hole_grid, start, goal):
+    """
+    Removes the holes on a straight path (rows first, then columns) from the start to the goal
+    """
+    rows = np.arange(min(start[0], goal[0]), max(start[0], goal[0]) + 1)
+    cols = np.arange(min(start[1], goal[1]), max(start[1], goal[1]) + 1)
+    hole_grid[rows, start[1]] = False
+    hole_grid[goal[0], cols] = False
+    return hole_grid
+
+
+def generate_solvable_holes(n, holes_num, start, goal, rng=np.random, max_tries=100):
+    """
+    Samples hole grids until the goal is reachable from the start. If none of the max_tries
+    samples is solvable, the last one is repaired instead.
+    """
+    for _ in range(max_tries):
+        hole_grid = sample_holes(n, holes_num, start, goal, rng)
+        if is_reachable(hole_grid, start, goal):
+            return hole_grid
+    return repair(hole_grid, start, goal)
+
+
+def pack_holes(hole_grid):
+    """
+    Packs a boolean hole grid into a bitmask (row-major)
+    """
+    return np.packbits(np.asarray(hole_grid, dtype=bool).ravel())
+
+
+def unpack_holes(packed, n):
+    """
+    Unpacks a bitmask back into a boolean n x n hole grid
+    """
+    return np.unpackbits(packed, count=n * n).astype(bool).reshape(n, n)
+
+
+def generate_maps(count, n=None, slip=None, seed=None):
+    """
+    Generates solvable maps as a structured array of records (n, goal, slip, packed holes).
+    :param n: grid size of all the maps (random in [5, 22] by default, like RandomFrozenLake)
+    :param slip: slip level of all the maps (random in {0, 1, 2} by default)
+    """
+    rng = np.random.default_rng(seed)
+    max_n = 22 if n is None else n
+    maps = np.zeros(count, dtype=map_dtype((max_n * max_n + 7) // 8))
+    start = (0, 0)
+    for i in range(count):
+        map_n = int(rng.integers(5, 23)) if n is None else n
+        map_slip = int(rng.integers(0, 3)) if slip is None else slip
+        goal = random_goal(map_n, rng)
+        hole_grid = generate_solvable_holes(map_n, holes_count(map_n, map_slip), start, goal, rng)
+        packed = pack_holes(hole_grid)
+        maps[i]['n'] = map_n
+        maps[i]['goal'] = goal
+        maps[i]['slip'] = map_slip
+        maps[i]['holes'][:len(packed)] = packed
+    return maps
+
+
+def write_map_dataset(path, count, n=None, slip=None, seed=None, chunk_size=100000):
+    """
+    Writes count solvable maps to disk, chunk by chunk.
+    A ".npz" path gives a compressed file, any other path a memory-mapped ".npy" file.
+    """
+    seeds = np.random.SeedSequence(seed).spawn((count + chunk_size - 1) // chunk_size)
+    chunks = ((i * chunk_size, min(count - i * chunk_size, chunk_size), chunk_seed)
+              for i, chunk_seed in enumerate(seeds))
+    if path.endswith(".npz"):
+        maps = np.concatenate([generate_maps(size, n, slip, chunk_seed) for _, size, chunk_seed in chunks])
+        np.savez_compressed(path, maps=maps)
+        return
+    max_n = 22 if n is None else n
+    dataset = np.lib.format.open_memmap(path, mode="w+", dtype=map_dtype((max_n * max_n + 7) // 8), shape=(count,))
+    for offset, size, chunk_seed in chunks:
+        dataset[offset:offset + size] = generate_maps(size, n, slip, chunk_seed)
+    dataset.flush()
+
+
+def load_map_dataset(path):
+    """
+    Loads a dataset of maps (a ".npy" file is memory-mapped, not read in memory)
+    """
+    if path.endswith(".npz"):
+        with np.load(path) as data:
+            return data["maps"]
+    return np.load(path, mmap_mode="r")
+
+
+def iter_maps(maps):
+    """
+    Streams the maps of a dataset as (n, goal, hole_grid, slip)
+    """
+    for record in maps:
+        n = int(record['n'])
+        yield n, tuple(int(x) for x in record['goal']), unpack_holes(record['holes'], n), int(record['slip'])
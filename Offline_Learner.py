@@ -0,0 +1,103 @@
+import numpy as np
+from VectorFrozenLake import MOVES
+from Trajectory_Recorder import load_trajectories
+
+"""
+File:   Offline_Learner.py
+Author: Koutounidis Christos-Angelos
+Description: Offline (batch) Q-learning from recorded transitions, without replaying the
+             environment. The logs are streamed once in large memory-mapped chunks and reduced
+             with np.bincount to per (state, inputed action, REAL action) counts and reward
+             sums. Then every sweep applies the update of agent_plays_game to all the logged
+             (state, action) pairs at once, with the TD targets of each pair averaged:
+             Q[s,a] += α(mean(r + γ max Q[s']) - Q[s,a])
+             so re-training with another γ/α costs a few array operations per sweep, whatever
+             the length of the logs.
+"""
+
+CHUNK_SIZE = 1 << 22     # Transitions per chunk of the logs (64 MB of records)
+
+
+def next_state_table(n):
+    """
+    Next state index of every (state, REAL action), shape [n*n, 4]
+    """
+    rows, cols = np.divmod(np.arange(n * n), n)
+    new_rows = np.clip(rows[:, None] + MOVES[:, 0], 0, n - 1)
+    new_cols = np.clip(cols[:, None] + MOVES[:, 1], 0, n - 1)
+    return new_rows * n + new_cols
+
+
+class OfflineLearner:
+    def __init__(self, n, gamma, alpha, Q=None):
+        """
+        :param n: grid size of the map the transitions were recorded on
+        :param gamma: discount factor
+        :param alpha: learning rate of each sweep
+        :param Q: initial Q-values [n*n, 4] (e.g. the online learner's), zeros by default
+        """
+        self.n = n
+        self.n_states = n * n
+        self.gamma = gamma
+        self.alpha = alpha
+        self.Q = np.zeros((self.n_states, 4)) if Q is None else np.array(Q, dtype=np.float64)
+        self.next_state = next_state_table(n)
+        # Sufficient statistics of the logs, per (state, inputed action, REAL action)
+        self.counts = np.zeros((self.n_states, 4, 4))
+        self.reward_sums = np.zeros((self.n_states, 4, 4))
+        self.transitions = 0
+
+    def add(self, records):
+        """
+        Adds a batch of transitions (structured array with the fields of TRANSITION_DTYPE)
+        """
+        keys = (records["state"].astype(np.int64) * 4 + records["intended"]) * 4 + records["actual"]
+        size = self.counts.size
+        self.counts += np.bincount(keys, minlength=size).reshape(self.counts.shape)
+        self.reward_sums += np.bincount(keys, weights=records["reward"], minlength=size).reshape(self.counts.shape)
+        self.transitions += len(records)
+
+    def add_file(self, path, chunk_size=CHUNK_SIZE):
+        """
+        Streams a recorded file (memory-mapped) into the statistics, chunk by chunk
+        """
+        records = load_trajectories(path)
+        for start in range(0, len(records), chunk_size):
+            self.add(records[start:start + chunk_size])
+        return len(records)
+
+    def sweep(self):
+        """
+        One batched update of every logged (state, action) pair. Returns the max |ΔQ|.
+        """
+        visits = self.counts.sum(axis=2)                               # [n*n, 4]
+        seen = visits > 0
+        V = self.Q.max(axis=1)
+        # Σ over the samples of (r + γ max Q[s']), the next state depends on the REAL action
+        targets = self.reward_sums.sum(axis=2) + self.gamma * (self.counts * V[self.next_state][:, None, :]).sum(axis=2)
+        change = self.alpha * (targets[seen] / visits[seen] - self.Q[seen])
+        self.Q[seen] += change
+        return float(np.abs(change).max()) if change.size else 0.0
+
+    def fit(self, sweeps=10000, tol=1e-6):
+        """
+        Sweeps until the max change of Q gets below tol. Returns the number of sweeps.
+        """
+        for sweep in range(1, sweeps + 1):
+            if self.sweep() < tol:
+                break
+        return sweep
+
+    def greedy_policy(self):
+        """
+        Best move of each cell based on the current Q-values
+        """
+        return self.Q.argmax(axis=1)
+
+    def best_move_per_cell(self):
+        """
+        The policy in the format of RandomFrozenLake.best_move_per_cell
+        """
+        best_moves = np.full(self.n_states, None)
+        best_moves[:] = self.greedy_policy().tolist()
+        return best_moves
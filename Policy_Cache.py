@@ -0,0 +1,90 @@
+import os
+import hashlib
+from collections import OrderedDict
+import numpy as np
+from Map_Generator import pack_holes
+
+"""
+File:   Policy_Cache.py
+Author: Koutounidis Christos-Angelos
+Description: Cache of the computed policies and Q-tables, keyed by a fingerprint of the map.
+             Replayed maps (fixed seeds, regression maps) start from the learned policy
+             immediately, instead of running the visual analyzer and the learning again.
+"""
+
+
+def map_fingerprint(n, goal, holes, slip):
+    """
+    Fingerprint of a map, from its size, goal, slip and packed holes bitmask
+    :param holes: iterable of hole cells (row, col) or a boolean n x n grid
+    """
+    hole_grid = np.zeros((n, n), dtype=bool)
+    if isinstance(holes, np.ndarray):
+        hole_grid[:] = holes
+    else:
+        for hole in holes:
+            hole_grid[hole] = True
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.array([n, goal[0], goal[1], slip], dtype=np.int64).tobytes())
+    digest.update(pack_holes(hole_grid).tobytes())
+    return digest.hexdigest()
+
+
+def env_fingerprint(env):
+    """
+    Fingerprint of the current map of a RandomFrozenLake environment
+    """
+    return map_fingerprint(env.n, env.goal, env.holes, env.slip)
+
+
+class PolicyCache:
+    def __init__(self, max_entries=128, directory=None):
+        """
+        :param max_entries: size of the in-memory LRU (least recently used are evicted first)
+        :param directory: optional directory for the on-disk tier (one ".npz" file per map)
+        """
+        self.max_entries = max_entries
+        self.directory = directory
+        self.entries = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".npz")
+
+    def get(self, key):
+        """
+        Returns the cached (policy, Q) of a map, or None
+        """
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        if self.directory is not None and os.path.exists(self.path(key)):
+            with np.load(self.path(key)) as data:
+                entry = (data["policy"], data["Q"])
+            self.remember(key, entry)
+            return entry
+        return None
+
+    def put(self, key, policy, Q, persist=True):
+        """
+        Stores (copies of) the policy and the Q-table of a map
+        :param persist: also write it to the on-disk tier. The game loops keep it in memory after
+                        every episode and write it once when the game ends.
+        """
+        entry = (np.array(policy, dtype=np.int64), np.array(Q, dtype=np.float32))
+        self.remember(key, entry)
+        if persist and self.directory is not None:
+            np.savez(self.path(key), policy=entry[0], Q=entry[1])
+
+    def remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self.entries or (self.directory is not None and os.path.exists(self.path(key)))
+
+    def __len__(self):
+        return len(self.entries)
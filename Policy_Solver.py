@@ -0,0 +1,107 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import spsolve
+from Transition_Model import TransitionModel
+
+"""
+File:   Policy_Solver.py
+Author: Koutounidis Christos-Angelos
+Description: Exact solvers (Value Iteration and Policy Iteration) for a Random Frozen Lake map.
+             They use the compiled TransitionModel as sparse matrices, so the Bellman backups
+             are vectorized and take into account the slip probabilities.
+"""
+
+
+def get_model(env):
+    """
+    Returns the compiled model of the environment (compiling it if needed)
+    """
+    if getattr(env, "model", None) is not None:
+        return env.model
+    return TransitionModel.from_env(env)
+
+
+def transition_matrices(model):
+    """
+    Builds one sparse [n*n, n*n] transition matrix P(s' | s, a) per action.
+    The rows of the final (END) states are empty, since the game stops there.
+    """
+    n_states = model.n_states
+    active = np.flatnonzero(~model.terminal)
+    rows = np.repeat(active, 3)
+    data = np.tile(model.probabilities, len(active))
+    matrices = []
+    for a in range(4):
+        cols = model.next_state[active, a, :].ravel()
+        P = sparse.csr_matrix((data, (rows, cols)), shape=(n_states, n_states))
+        P.eliminate_zeros()
+        matrices.append(P)
+    return matrices
+
+
+def bellman_q(model, matrices, V, gamma, R=None):
+    """
+    One Bellman backup: Q(s,a) = R(s,a) + γ * Σ P(s'|s,a) V(s'), shape [n*n, 4]
+    :param R: expected rewards of the model, computed once by the iterative solvers
+    """
+    R = model.expected_rewards() if R is None else R
+    # Column-major, so that each action's column and the max over the actions are contiguous
+    Q = np.empty((model.n_states, 4), order="F")
+    for a in range(4):
+        Q[:, a] = R[:, a] + gamma * (matrices[a] @ V)
+    Q[model.terminal] = 0
+    return Q
+
+
+def value_iteration(env, gamma=None, tol=1e-8, max_iterations=100000):
+    """
+    Computes the optimal policy with Value Iteration.
+    :param env: RandomFrozenLake environment (with its holes generated)
+    :param gamma: discount factor (the environment's gamma by default)
+    :param tol: stopping threshold on the max change of the value function
+    :return: policy [n*n], value function V [n*n] and Q-values [n*n, 4]
+    """
+    gamma = env.gamma if gamma is None else gamma
+    model = get_model(env)
+    matrices = transition_matrices(model)
+    R = model.expected_rewards()
+    V = np.zeros(model.n_states)
+    for _ in range(max_iterations):
+        Q = bellman_q(model, matrices, V, gamma, R)
+        V_new = Q.max(axis=1)
+        delta = np.max(np.abs(V_new - V))
+        V = V_new
+        if delta < tol:
+            break
+    Q = bellman_q(model, matrices, V, gamma, R)
+    return Q.argmax(axis=1), V, Q
+
+
+def policy_iteration(env, gamma=None, max_iterations=1000):
+    """
+    Computes the optimal policy with Policy Iteration. Each evaluation is an exact sparse
+    linear solve of (I - γ P_π) V = R_π.
+    :return: policy [n*n], value function V [n*n] and Q-values [n*n, 4]
+    """
+    gamma = env.gamma if gamma is None else gamma
+    model = get_model(env)
+    matrices = transition_matrices(model)
+    R = model.expected_rewards()
+    R[model.terminal] = 0
+    identity = sparse.identity(model.n_states, format="csr")
+    policy = np.zeros(model.n_states, dtype=np.int64)
+    V = np.zeros(model.n_states)
+    for _ in range(max_iterations):
+        # Policy evaluation
+        P_policy = sum(sparse.diags((policy == a).astype(float)) @ matrices[a] for a in range(4))
+        R_policy = R[np.arange(model.n_states), policy]
+        V = spsolve((identity - gamma * P_policy).tocsc(), R_policy)
+        # Policy improvement (keeping the old action on ties, to guarantee termination)
+        Q = bellman_q(model, matrices, V, gamma)
+        best = Q.argmax(axis=1)
+        keep = np.isclose(Q[np.arange(model.n_states), policy], Q[np.arange(model.n_states), best])
+        new_policy = np.where(keep, policy, best)
+        if np.array_equal(new_policy, policy):
+            break
+        policy = new_policy
+    return policy, V, bellman_q(model, matrices, V, gamma)
@@ -0,0 +1,192 @@
+import os
+import json
+import numpy as np
+from VectorFrozenLake import GOAL_REWARD
+
+"""
+File:   Q_Learner.py
+Author: Koutounidis Christos-Angelos
+Description: Array-backed Q-learning for the Random Frozen Lake. The Q-table is a contiguous
+             float32 array of shape (n*n, 4) and the greedy policy is a single argmax.
+             It can be used by the GUI game loop, or headless through train(), optionally
+             with the Numba-compiled episodes of Episode_Kernel.py. With planning_steps, the
+             real steps are complemented by the prioritized sweeping of Dyna_Planner.py.
+"""
+
+# Hand-picked (γ, α) for each slip level, the same ones used by play_game
+DEFAULT_SETTINGS = {
+    0: {"gamma": 0.6, "alpha": 0.35, "bonus": 10},
+    1: {"gamma": 0.95, "alpha": 0.45, "bonus": 10},
+    2: {"gamma": 0.95, "alpha": 0.35, "bonus": 10},
+}
+
+# Table of tuned settings written by the hyperparameter sweep (Hyperparameter_Sweep.py)
+TUNED_SETTINGS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tuned_defaults.json")
+
+
+def load_settings(path=TUNED_SETTINGS_PATH):
+    """
+    Returns the Q-learning settings of each slip level: the tuned ones if the sweep's table
+    exists, otherwise the hand-picked defaults
+    """
+    settings = {slip: dict(values) for slip, values in DEFAULT_SETTINGS.items()}
+    if os.path.exists(path):
+        with open(path) as file:
+            for slip, values in json.load(file).items():
+                settings.setdefault(int(slip), {}).update(
+                    {key: values[key] for key in ("gamma", "alpha", "bonus") if key in values})
+    return settings
+
+
+class QLearner:
+    def __init__(self, env, gamma=None, alpha=None, bonus=10, kernel=False, planning_steps=0):
+        """
+        :param env: RandomFrozenLake environment (with its holes generated)
+        :param gamma: discount factor (the environment's gamma by default)
+        :param alpha: learning rate (the environment's alpha by default)
+        :param bonus: initial Q-value given to the suggested move of each cell
+        :param kernel: train() plays the episodes with the compiled kernel when Numba is installed
+                       (and nothing is being recorded or planned), otherwise with run_episode
+        :param planning_steps: model-based backups (Dyna_Planner.py) after every real step, 0 for none
+        """
+        self.env = env
+        self.n_states = env.n * env.n
+        self.gamma = env.gamma if gamma is None else gamma
+        self.alpha = env.alpha if alpha is None else alpha
+        self.bonus = bonus
+        self.kernel = kernel
+        self.Q = np.zeros((self.n_states, 4), dtype=np.float32)
+        self.policy = np.zeros(self.n_states, dtype=np.int64)
+        self.reached_goal = False
+        self.loop_breaks = 0
+        self.planner = None
+        if planning_steps:
+            from Dyna_Planner import DynaPlanner
+            self.planner = DynaPlanner(self, planning_steps)
+
+    def seed_from_policy(self, best_moves):
+        """
+        Initializes the Q-values based on suggested moves (e.g. the visual analyzer's):
+        the suggested move of each cell gets the bonus and every other action gets 0
+        """
+        moves = np.array([-1 if move is None else move for move in best_moves], dtype=np.int64)
+        valid = np.flatnonzero(moves >= 0)
+        self.Q[:] = 0
+        self.Q[valid, moves[valid]] = self.bonus
+        self.policy = self.greedy_policy()
+        if self.planner is not None:
+            self.planner.refresh()
+
+    def seed_from_values(self, Q):
+        """
+        Initializes the Q-values with given ones (e.g. the exact solver's)
+        """
+        self.Q[:] = Q
+        self.policy = self.greedy_policy()
+        if self.planner is not None:
+            self.planner.refresh()
+
+    def greedy_policy(self):
+        """
+        Best move of each cell based on the current Q-values
+        """
+        return self.Q.argmax(axis=1)
+
+    def update(self, state_index, action, reward, next_state_index):
+        """
+        Q_new = Q_old + α(reward + γ(max(Q_next_state)) - Q_old)
+        """
+        Q = self.Q
+        Q[state_index, action] += self.alpha * (reward + self.gamma * Q[next_state_index].max() - Q[state_index, action])
+
+    def choose_action(self, state_index, visits):
+        """
+        Returns the action of the current policy. In Non-slippery environments, if a state has
+        been visited more than 5 times in this episode (infinite loop), a random other direction
+        is chosen and it becomes the new best move of the state.
+        """
+        if self.env.slip == 0 and visits > 5:
+            all_directions = [0, 1, 2, 3]
+            all_directions.remove(self.policy[state_index])
+            self.policy[state_index] = self.env.explore_draws.choice(all_directions)
+            self.loop_breaks += 1
+        return self.policy[state_index]
+
+    def run_episode(self, max_steps):
+        """
+        Plays one headless episode from the start, updating Q at every step.
+        At the end the policy is rebuilt from the Q-values. Returns the total reward
+        (and sets reached_goal).
+        """
+        env = self.env
+        model = env.model if env.model is not None else env.compile_model()
+        next_state, rewards, done = model.next_state, model.rewards, model.done
+        slip_outcome = model.slip_outcome
+        draw = env.slip_draws.random
+        final_actions = model.final_actions
+        recorder = env.recorder
+        planner = self.planner
+        state_visit_counts = np.zeros(self.n_states, dtype=np.int64)
+        state_index = env.start[0] * env.n + env.start[1]
+        total_reward = 0.0
+        self.reached_goal = False
+        self.loop_breaks = 0
+        steps = 0
+
+        for steps in range(1, max_steps + 1):
+            state_visit_counts[state_index] += 1
+            action = self.choose_action(state_index, state_visit_counts[state_index])
+            k = slip_outcome(draw())
+            next_state_index = next_state[state_index, action, k]
+            reward = rewards[state_index, action, k]
+            self.update(state_index, action, reward, next_state_index)
+            if planner is not None:
+                planner.observe(state_index, action, final_actions[action][k], reward)
+                planner.plan()
+            total_reward += reward
+            if recorder is not None:
+                recorder.record(state_index, action, final_actions[action][k], reward, done[state_index, action, k])
+            if done[state_index, action, k]:
+                self.reached_goal = reward == GOAL_REWARD
+                break
+            state_index = next_state_index
+
+        self.policy = self.greedy_policy()
+        env.metrics.record_episode(steps, total_reward, int(np.count_nonzero(state_visit_counts)), self.loop_breaks)
+        return total_reward
+
+    def train(self, episodes, max_steps=None, monitor=None):
+        """
+        Headless training loop (no GUI and no sleeps).
+        :param episodes: number of episodes to play
+        :param max_steps: maximum steps per episode (100 * n^2 by default)
+        :param monitor: ConvergenceMonitor checked after every episode, the training stops as soon
+                        as it converges (the episodes are then played without the kernel)
+        :return: array with the total reward of every episode played
+        """
+        max_steps = 100 * self.n_states if max_steps is None else max_steps
+        if self.kernel and self.env.recorder is None and self.planner is None and monitor is None:
+            from Episode_Kernel import NUMBA_AVAILABLE, run_episodes
+            if NUMBA_AVAILABLE:
+                episode_rewards = run_episodes(self, episodes, max_steps)
+                self.sync_env()
+                return episode_rewards
+        if monitor is not None and monitor.started is None:
+            monitor.start(self.policy, self.Q)
+        episode_rewards = np.empty(episodes)
+        for episode in range(episodes):
+            episode_rewards[episode] = self.run_episode(max_steps)
+            if monitor is not None and monitor.update(self.policy, self.Q, episode_rewards[episode]):
+                episode_rewards = episode_rewards[:episode + 1]
+                break
+        self.sync_env()
+        if self.env.recorder is not None:
+            self.env.recorder.flush()
+        return episode_rewards
+
+    def sync_env(self):
+        """
+        Copies the current policy to the environment's best_move_per_cell
+        """
+        # One vectorized copy (the moves are stored as Python ints), instead of n*n set_best_move calls
+        self.env.best_move_per_cell[:] = self.policy.tolist()
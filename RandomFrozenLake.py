@@ -1,99 +1,121 @@
 import numpy as np
-import pygame
 import sys
-from Visual_Analyzer import GameAnalyzer
-import win32gui
+import os
+from Transition_Model import TransitionModel
+from Q_Learner import QLearner, load_settings
+from Map_Generator import holes_count, random_goal, generate_solvable_holes
+from Random_Stream import spawn_streams
+from Policy_Cache import env_fingerprint
+from Instrumentation import NO_INSTRUMENTATION
+from Terminal_Renderer import map_text, best_actions_text
 import time
-import random
 
 """
 File:   RandomFrozenLake.py
 Author: Koutounidis Christos-Angelos
 Description: Main program code. It has functions for the creation of the random
              Environment, the GUI and the "game-play" 
+             The environment core only needs NumPy. The GUI (pygame), the visual analyzer
+             (OpenCV) and the exact solver (SciPy) are imported lazily, when first used.
 """
 
-def draw_arrow(screen, direction, cell_rect):
+
+def __getattr__(name):
+    # draw_arrow lives with the renderer now, it is only imported (with pygame) when asked for
+    if name == "draw_arrow":
+        from Board_Renderer import draw_arrow
+        return draw_arrow
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def load_win32gui():
     """
-    Used to draw the best action to take in each box   ( ↑  ←  ↓  → )
+    Lazily imports win32gui, used to move the window for the screenshot analyzer (Windows only)
     """
-    center_x, center_y = cell_rect.center
-    if direction == 0:  # UP arrow
-        pygame.draw.polygon(screen, (0, 0, 0), [
-            (center_x, center_y - 10),
-            (center_x - 5, center_y),
-            (center_x + 5, center_y)
-        ])
-        pygame.draw.line(screen, (0, 0, 0), (center_x, center_y), (center_x, center_y + 5), 2)
-    elif direction == 1:  # LEFT arrow
-        pygame.draw.polygon(screen, (0, 0, 0), [
-            (center_x - 10, center_y),
-            (center_x, center_y - 5),
-            (center_x, center_y + 5)
-        ])
-        pygame.draw.line(screen, (0, 0, 0), (center_x, center_y), (center_x + 5, center_y), 2)
-    elif direction == 2:  # DOWN arrow
-        pygame.draw.polygon(screen, (0, 0, 0), [
-            (center_x, center_y + 10),
-            (center_x - 5, center_y),
-            (center_x + 5, center_y)
-        ])
-        pygame.draw.line(screen, (0, 0, 0), (center_x, center_y), (center_x, center_y - 5), 2)
-    elif direction == 3:  # RIGHT arrow
-        pygame.draw.polygon(screen, (0, 0, 0), [
-            (center_x + 10, center_y),
-            (center_x, center_y - 5),
-            (center_x, center_y + 5)
-        ])
-        pygame.draw.line(screen, (0, 0, 0), (center_x, center_y), (center_x - 5, center_y), 2)
-    else:
-        pass
+    try:
+        import win32gui
+    except ImportError:     # Not on Windows, the game can only run offscreen
+        return None
+    return win32gui
+
+
+# Largest board (cells per side) shown in the GUI window, bigger lakes are shown through a
+# viewport that follows the agent
+MAX_VIEW_CELLS = 22
 
 
 class RandomFrozenLake:
-    def __init__(self, n=None):
-        self.n = np.random.randint(5, 23)
+    def __init__(self, n=None, policy_cache=None, instrumentation=None, seed=None, recorder=None):
+        """
+        :param n: grid size, random in [5, 22] by default. Large lakes (hundreds to thousands
+                  of cells per side) are supported.
+        :param seed: seed of the environment's own random generator. The same seed gives the
+                     same map and the same episodes (random if None).
+        :param recorder: optional TrajectoryRecorder, logging every transition of the game
+                         sessions and of the headless training
+        :param policy_cache: optional PolicyCache, so that repeated maps start from their learned policy
+        :param instrumentation: optional Instrumentation, recording the time of each phase and
+                                per-episode statistics of the game sessions
+        """
+        self.rng = np.random.default_rng(seed)
+        self.seed_dynamics()
+        self.n = int(self.rng.integers(5, 23)) if n is None else int(n)
         self.grid_size = (self.n, self.n)
         self.start = (0, 0)
-        if random.random() <= 0.5:
-            self.goal = (np.random.randint(int(np.ceil(self.n/2)), self.n), np.random.randint(int(self.n/4), self.n))
-        else:
-            self.goal = (np.random.randint(int(self.n/4), self.n), np.random.randint(int(np.ceil(self.n/2)), self.n))
-        self.holes = set()
+        self.goal = random_goal(self.n, self.rng)
+        self.holes = np.zeros(self.grid_size, dtype=np.uint8)    # 1 where there is a hole
         self.state = self.start
         self.done = False
         self.slip = 0
+        self.model = None
+        self.policy_cache = policy_cache
+        self.metrics = NO_INSTRUMENTATION if instrumentation is None else instrumentation
+        self.recorder = recorder
+        self.last_action = None
         self.best_move_per_cell = np.full(np.prod(self.grid_size), None)
         # Defining the Q learning parameters (γ and α)
         self.gamma = 0.95
         self.alpha = 0.25
 
+    def seed_dynamics(self, seed=None):
+        """
+        (Re)creates the block-sampled random streams of the slips (step) and of the exploration
+        (infinite loop breaker). They are children of the environment's generator, or of a new
+        one when a seed is given, e.g. to replay different episodes on the same map.
+        """
+        rng = self.rng if seed is None else np.random.default_rng(seed)
+        self.slip_draws, self.explore_draws = spawn_streams(rng, 2)
+
     def generate_holes(self):
         """
-        Generated holes based on the slipperiness of the environment
+        Generated holes based on the slipperiness of the environment.
+        The holes are sampled in one draw and the map is guaranteed to be solvable
+        (the goal is reachable from the start).
+        Returns the holes as a uint8 n x n grid (1 byte per cell, instead of a set of tuples).
         """
-        if self.slip == 0:
-            holes_num = int(self.n * (self.n / 5))      # holes are (n^2)/5
-        elif self.slip == 1:
-            holes_num = int(self.n * (self.n / 7.5))    # holes are (n^2)/7.5
-        elif self.slip == 2:
-            holes_num = int((self.n ** (3 / 2)) / 2)  # holes are (n^(3/2))/2.5
-        holes = set()
-        while len(holes) < holes_num:
-            hole = (np.random.randint(self.n), np.random.randint(self.n))
-            if hole != self.start and hole != self.goal:
-                holes.add(hole)
-        return holes
+        holes_num = holes_count(self.n, self.slip)
+        hole_grid = generate_solvable_holes(self.n, holes_num, self.start, self.goal, self.rng)
+        return hole_grid.astype(np.uint8)
 
     def step(self, action):
         """
         This function determines the FINAL action taken based on the slip probabilities.
         It takes as input the "inputed" action and returns the calculated REAL action.
+        The REAL action taken is kept in last_action (e.g. for the trajectory recorder).
         """
         if self.done:
             print("Game is over. Reset the environment to play again.")
             return self.state, 0, self.done
 
+        # Table-lookup step when the map has been compiled
+        if self.model is not None:
+            state_index = self.state[0] * self.n + self.state[1]
+            k = self.model.slip_outcome(self.slip_draws.random())
+            next_index, reward, self.done = self.model.outcome(state_index, action, k)
+            self.last_action = self.model.final_actions[action][k]
+            self.state = divmod(next_index, self.n)
+            return self.state, reward, self.done
+
         # Available moves
         moves = {0: (-1, 0), 1: (0, -1), 2: (1, 0), 3: (0, 1)}  # Up, Left, Down, Right
 
@@ -116,8 +138,10 @@ class RandomFrozenLake:
         elif action == 3:   # Right (→)
             choices = [3, 2, 0]         # Right (→) P(1), Down (↓) P(2), Up (↑) P(3)
 
-        # Action based on slip probabilities
-        final_action = np.random.choice(choices, p=slip_probabilities)
+        # Action based on slip probabilities (same sampling rule as np.random.choice)
+        cumulative = np.cumsum(slip_probabilities)
+        final_action = choices[min(int(np.searchsorted(cumulative, self.slip_draws.random(), side="right")), 2)]
+        self.last_action = final_action
         move = moves[final_action]
 
         # Calculate new position
@@ -126,7 +150,7 @@ class RandomFrozenLake:
         self.state = (new_row, new_col)
 
         # Check for holes and goal
-        if self.state in self.holes:
+        if self.holes[self.state]:
             self.done = True
             return self.state, -20, self.done   # Hole
         elif self.state == self.goal:
@@ -134,6 +158,14 @@ class RandomFrozenLake:
             return self.state, 100, self.done   # Goal
         return self.state, -0.1, self.done      # Safe
 
+    def compile_model(self):
+        """
+        Compiles the current map (holes, goal and slip) into a TransitionModel, so that step()
+        becomes a table lookup. It has to be called again if the map changes.
+        """
+        self.model = TransitionModel.from_env(self)
+        return self.model
+
     def reset(self):
         """
         Resets the game state to the starting state
@@ -144,64 +176,89 @@ class RandomFrozenLake:
 
     def render(self):
         """
-        Renders the environment in the terminal
+        Renders the environment in the terminal (one write, see Terminal_Renderer.py)
         """
-        print(" " + "_" * ((3*self.n)-1))
-        for i in range(self.n):
-            row = "|"
-            for j in range(self.n):
-                if (i, j) == self.state:
-                    cell = "P"
-                elif (i, j) == self.goal:
-                    cell = "G"
-                elif (i, j) in self.holes:
-                    cell = "X"
-                else:
-                    cell = " "
-                if j == self.n - 1:
-                    row += f"{cell} |"
-                else:
-                    row += f"{cell}  "
-            print(row)
-        print(" " + "‾" * ((3*self.n)-1))
+        sys.stdout.write(map_text(self))
 
     def print_best_actions_grid(self):
         """
-        Function to print grid with best actions in the Terminal
+        Function to print grid with best actions in the Terminal (one write, see Terminal_Renderer.py)
         """
-        action_symbols = ['↑', '←', '↓', '→']  # Up, Left, Down, Right
-        best_actions = np.zeros(self.grid_size, dtype=str)
-
-        for row in range(self.grid_size[0]):
-            for col in range(self.grid_size[1]):
-                state_vector = np.zeros(np.prod(self.grid_size))
-                state_index = np.ravel_multi_index((row, col), self.grid_size)
-                state_vector[state_index] = 1
-                state_vector = np.reshape(state_vector, [1, -1])
-
-                best_action = self.best_move_per_cell[state_index]
-                best_actions[row, col] = action_symbols[best_action]
-
-        # Placing symbols for goal(G), and holes(X)
-        best_actions[self.goal] = 'G'   # goal
-        for hole in self.holes:
-            best_actions[hole] = 'X'    # holes
-
-        print("Best actions grid:")
-        for row in range(self.grid_size[0]):
-            print(' '.join(best_actions[row]))
+        sys.stdout.write("Best actions grid:\n" + best_actions_text(self))
 
     def set_best_move(self, state_index, best_move):
         self.best_move_per_cell[state_index] = best_move
 
-    def play_game(self):
+    def analyzer_best_moves(self, screen, cell_size, offscreen):
+        """
+        Sets the best move of each cell using the visual analyzer and returns the number of
+        cells found. Offscreen, the analyzer reads the pixels of the rendered pygame Surface
+        directly, otherwise it takes a screenshot of the window.
+        """
+        from Visual_Analyzer import GameAnalyzer
+        Agent_suggestions = GameAnalyzer(self.n, cell_size, self.metrics)
+        if offscreen:
+            best_moves = Agent_suggestions.analyze_surface(screen)     # Reading the Surface's pixels in-process
+        else:
+            with self.metrics.phase("analyzer_sleep"):
+                time.sleep(1)
+            with self.metrics.phase("analyzer_capture"):
+                image = Agent_suggestions.capture_game_area()           # Getting the screenshot using MSS
+            with self.metrics.phase("analyzer_find_elements"):
+                elements = Agent_suggestions.find_elements(image)       # Proccesing the screenshot using OpenCV
+            with self.metrics.phase("analyzer_best_moves"):
+                best_moves = Agent_suggestions.calculate_best_moves(elements)   # Calculating the best moves using the data gained
+        sorted_positions = sorted(best_moves.keys(), key=lambda position: (position[1], position[0]))
+        for index, pos in enumerate(sorted_positions):
+            self.set_best_move(index, best_moves[pos])
+        return len(sorted_positions)
+
+    def cached_best_moves(self):
+        """
+        Sets the best move of each cell from the policy cache, if this map has been seen before.
+        Returns the cached Q-table, or None when the map isn't cached.
+        """
+        if self.policy_cache is None:
+            return None
+        cached = self.policy_cache.get(env_fingerprint(self))
+        if cached is None:
+            return None
+        policy, Q = cached
+        self.best_move_per_cell[:] = np.asarray(policy).tolist()
+        return Q
+
+    def solver_best_moves(self):
+        """
+        Sets the best move of each cell using the exact solver (Value Iteration on the compiled
+        map, slip probabilities included), without any screen capture.
+        Returns the optimal Q-values [n*n, 4], that can be used to seed the Q-learning.
+        """
+        from Policy_Solver import value_iteration
+        policy, _, Q = value_iteration(self)
+        self.best_move_per_cell[:] = np.asarray(policy).tolist()
+        return Q
+
+    def play_game(self, background=False, planning_steps=0, dynamic=False, convergence=None,
+                  stop_on_convergence=False, policy_source="solver", turbo=False, target_fps=40):
         """
         Game setup function.
         Here the 2 user choice GUI's are created and the parameters chosen are stored in order
         to create the environment. This function also directs the program to 1 of the 2 main
         game functions (User plays and Agent plays).
+        :param background: the agent learns in a separate process (see agent_plays_game, not with the recorder)
+        :param planning_steps: model-based backups of the agent after every real step (see agent_plays_game)
+        :param dynamic: the lake can be changed with the mouse during the game (see agent_plays_game)
+        :param convergence: ConvergenceMonitor of the agent's learning (see agent_plays_game)
+        :param stop_on_convergence: the game ends when the learning converges
+        :param policy_source: initial best moves, "solver" (exact Value Iteration) or "analyzer" (visual analyzer)
+        :param turbo: the agent runs as many learning steps as fit into each frame (see agent_plays_game)
+        :param target_fps: frames per second of the agent's game
         """
+        # Q-learning settings (γ, α, initial bonus) of each slip level, tuned ones if available
+        settings = load_settings()
+
         # initializing Pygame
+        import pygame
         pygame.init()
 
         black = (0, 0, 0)
@@ -286,47 +343,64 @@ class RandomFrozenLake:
                     elif not Selection_1:
                         if not_slippery_button.collidepoint(event.pos):
                             self.slip = 0
-                            self.gamma = 0.6
-                            self.alpha = 0.35
+                            self.gamma = settings[0]["gamma"]
+                            self.alpha = settings[0]["alpha"]
                             self.holes = self.generate_holes()
+                            self.compile_model()
                             print("\nInitial Random Map:")
                             self.render()
                             print("\n")
                             if Player:
-                                self.player_plays_game()
+                                self.player_plays_game(policy_source=policy_source)
                             elif not Player:
-                                self.agent_plays_game(self.gamma, self.alpha)
+                                self.agent_plays_game(self.gamma, self.alpha, bonus=settings[self.slip]["bonus"],
+                                                      policy_source=policy_source, turbo=turbo,
+                                                      target_fps=target_fps, background=background, planning_steps=planning_steps,
+                                                      dynamic=dynamic, convergence=convergence,
+                                                      stop_on_convergence=stop_on_convergence)
                             running = False
 
                         elif slippery_button.collidepoint(event.pos):
                             self.slip = 1
-                            self.gamma = 0.95
-                            self.alpha = 0.45
+                            self.gamma = settings[1]["gamma"]
+                            self.alpha = settings[1]["alpha"]
                             self.holes = self.generate_holes()
+                            self.compile_model()
                             print("\nInitial Random Map:")
                             self.render()
                             print("\n")
                             if Player:
-                                self.player_plays_game()
+                                self.player_plays_game(policy_source=policy_source)
                             elif not Player:
-                                self.agent_plays_game(self.gamma, self.alpha)
+                                self.agent_plays_game(self.gamma, self.alpha, bonus=settings[self.slip]["bonus"],
+                                                      policy_source=policy_source, turbo=turbo,
+                                                      target_fps=target_fps, background=background, planning_steps=planning_steps,
+                                                      dynamic=dynamic, convergence=convergence,
+                                                      stop_on_convergence=stop_on_convergence)
                             running = False
 
                         elif very_slippery_button.collidepoint(event.pos):
                             self.slip = 2
-                            self.gamma = 0.95
-                            self.alpha = 0.35
+                            self.gamma = settings[2]["gamma"]
+                            self.alpha = settings[2]["alpha"]
                             self.holes = self.generate_holes()
+                            self.compile_model()
                             print("\nInitial Random Map:")
                             self.render()
                             print("\n")
                             if Player:
-                                self.player_plays_game()
+                                self.player_plays_game(policy_source=policy_source)
                             elif not Player:
-                                self.agent_plays_game(self.gamma, self.alpha)
+                                self.agent_plays_game(self.gamma, self.alpha, bonus=settings[self.slip]["bonus"],
+                                                      policy_source=policy_source, turbo=turbo,
+                                                      target_fps=target_fps, background=background, planning_steps=planning_steps,
+                                                      dynamic=dynamic, convergence=convergence,
+                                                      stop_on_convergence=stop_on_convergence)
                             running = False
 
-    def agent_plays_game(self, gamma, alpha, cell_size=40):
+    def agent_plays_game(self, gamma, alpha, cell_size=40, policy_source="solver", offscreen=None,
+                         target_fps=40, turbo=False, bonus=10, background=False, planning_steps=0,
+                         dynamic=False, convergence=None, stop_on_convergence=False):
         """
         Used when the "agent" option is chosen
         The function initiates the game, the Graphical Interface and the graphical analyzer
@@ -335,31 +409,61 @@ class RandomFrozenLake:
         Using Q-learning we are making the agent adapt each time he plays the game
         :param gamma: discount factor
         :param alpha: learning rate
-        :param cell_size: DON'T CHANGE IT !, predetermined cell size in pixels (40x40). Crucial for visual analyzer !
+        :param cell_size: cell size in pixels (40x40 by default). The visual analyzer follows it, but needs cells
+                          big enough for the arrows (at least ~24 pixels)
+        :param policy_source: "solver" (exact Value Iteration, the default) or "analyzer" (visual analyzer on
+                              a screenshot). Lakes larger than the window (MAX_VIEW_CELLS) always use the solver.
+        :param offscreen: analyze the pygame Surface instead of a screenshot. By default it is used
+                          when win32gui is missing or SDL's video driver is "dummy"
+        :param target_fps: frames per second of the GUI (normally 1 learning step per frame)
+        :param turbo: run as many learning steps as fit into each frame, rendering one snapshot per frame
+        :param bonus: initial Q-value of the suggested best move of each cell
+        :param background: the Q-learner runs in its own process (Background_Learner.py) and the
+                           window only draws its latest snapshot from shared memory. The environment's
+                           recorder isn't used in this mode (the transitions happen in the other process).
+        :param planning_steps: prioritized sweeping backups (Dyna_Planner.py) on the learned model
+                               between two real steps, 0 for plain Q-learning
+        :param dynamic: dynamic lake (Dynamic_Lake.py, not with background): a left click on a cell
+                        melts its ice into a hole or freezes its hole over, a right click moves the
+                        goal there, and the Q-values are replanned only around the change
+        :param convergence: ConvergenceMonitor (Convergence.py, not with background) checked after every
+                            episode. When it converges, its report is printed and the agent stops
+                            learning and keeps playing its policy (evaluation only), or the game ends.
+        :param stop_on_convergence: the game ends when the learning converges
         """
-        Q = {}  # Initialize Q as an empty dictionary
+        # Array-backed Q-table (n*n, 4)
+        learner = QLearner(self, gamma, alpha, bonus, planning_steps=planning_steps)
+        planner = learner.planner
+        cached_Q = self.cached_best_moves()
 
         # initializing Pygame
+        import pygame
         pygame.init()
 
         white = (255, 255, 255)
-        black = (0, 0, 0)
-        lilac = (225,196,255)
         red = (245, 20, 20)
-        blue = (20, 20, 245)
-        green = (20, 245, 20)
 
-        # Setting the display size to be the environment grid and some buffer zone on the screen
-        window_size = ((self.n * cell_size)+40, (self.n * cell_size+2)+40)
+        # Setting the display size to be the (visible part of the) environment grid and some buffer zone on the screen
+        view_cells = min(self.n, MAX_VIEW_CELLS)
+        window_size = ((view_cells * cell_size)+40, (view_cells * cell_size+2)+40)
         screen = pygame.display.set_mode(window_size)
         pygame.display.set_caption('Random Frozen Lake MAP')
 
-        # Moving the window to a specific location on the screen, for the analyzer to be able to see it
-        moving_window = win32gui.FindWindow(None, 'Random Frozen Lake MAP')
-        win32gui.SetWindowPos(moving_window, 0, 80, 80, 0, 0, 0x0001)
+        win32gui = None if offscreen else load_win32gui()
+        if offscreen is None:
+            offscreen = win32gui is None or os.environ.get("SDL_VIDEODRIVER") == "dummy"
+        if not offscreen:
+            # Moving the window to a specific location on the screen, for the analyzer to be able to see it
+            moving_window = win32gui.FindWindow(None, 'Random Frozen Lake MAP')
+            win32gui.SetWindowPos(moving_window, 0, 80, 80, 0, 0, 0x0001)
 
         # Background -> white
         screen.fill(white)
+        from Board_Renderer import BoardRenderer
+        renderer = BoardRenderer(screen, self, cell_size, view_cells=view_cells)
+        if view_cells < self.n and policy_source == "analyzer":
+            # The analyzer needs the whole board on screen, large lakes use the exact solver instead
+            policy_source = "solver"
 
         font = pygame.font.Font(None, 36)
         outline_font = pygame.font.Font(None, 36)
@@ -368,133 +472,228 @@ class RandomFrozenLake:
         total_reward = 0
         index = 0
         counter = 0
-        past_states = []
+        loop_breaks = 0
         state_visit_counts = {}
-
-        while running:
-            # Render the game state
-            screen.fill(white)
-            k = 0
-
-            # Creating the graphical interface
-            for i in range(self.n):
-                for j in range(self.n):
-                    rect_1 = pygame.Rect(j * cell_size + 20, i * cell_size + 20, cell_size, cell_size)
-                    rect_2 = pygame.Rect(j * cell_size + 21, i * cell_size + 21, cell_size - 2, cell_size - 2)
-                    pygame.draw.rect(screen, black, rect_1, 1)
-
-                    if (i, j) == self.state and not self.done:
-                        pygame.draw.rect(screen, green, rect_2)
-                        # Arrows for the best move in the cell we are at, at the moment
-                        best_move = self.best_move_per_cell[k]
-                        draw_arrow(screen, best_move, rect_2)
-                    elif (i, j) == self.goal:
-                        pygame.draw.rect(screen, red, rect_2)
-                    elif (i, j) in self.holes:
-                        pygame.draw.rect(screen, blue, rect_2)
-                    else:
-                        pygame.draw.rect(screen, lilac, rect_2)
-                        # Arrows for the best move in each cell (not including holes and goal since they are END states)
-                        best_move = self.best_move_per_cell[k]
-                        draw_arrow(screen, best_move, rect_2)
-
-                    k += 1
-
-            pygame.display.flip()  # Update the display
-
-            if index == 0:
-                time.sleep(1)
-                # Using the visual Analyzer
-                Agent_suggestions = GameAnalyzer(self.n, cell_size)
-                image = Agent_suggestions.capture_game_area()           # Getting the screenshot using MSS
-                elements = Agent_suggestions.find_elements(image)       # Proccesing the screenshot using OpenCV
-                best_moves = Agent_suggestions.calculate_best_moves(elements)   # Calculating the best moves using the data gained
-                sorted_positions = sorted(best_moves.keys(), key=lambda position: (position[1], position[0]))
-                ordered_best_moves = {pos: best_moves[pos] for pos in sorted_positions}
-                for pos, move in ordered_best_moves.items():
-                    self.set_best_move(index, move)
-                    index += 1
-
-                self.print_best_actions_grid()
-                # Initializing Q-values based on the vizual analyzer's best moves
-                for s in range(self.n * self.n):
-                    Q[s] = {}  # Initialize Q[s] as an empty dictionary
-                    for a in range(4):
-                        if self.best_move_per_cell[s] == a:
-                            Q[s][a] = 10
-                        else:
-                            Q[s][a] = 0
-
+        metrics = self.metrics
+        recorder = self.recorder
+        if background and recorder is not None:
+            print("Warning: the transitions aren't recorded when the agent learns in the background")
+        evaluating = False      # Learning converged, the agent only plays its policy
+
+        def learning_step():
+            """
+            One step of the agent: move based on the best moves and update the Q-values
+            """
+            nonlocal total_reward, counter, state_visit_counts, loop_breaks, running, evaluating
+            if convergence is not None and convergence.started is None:
+                # First step after the seeding of the Q-values
+                convergence.start(learner.policy, learner.Q)
             # new game state (kainourgia kinisi)
             state_index = self.state[0] * self.n + self.state[1]
+            if planner is not None:
+                # The planner keeps the learner's policy greedy, the agent follows it at every step
+                self.best_move_per_cell[state_index] = int(learner.policy[state_index])
             # Counting how many times we visited each state
             if state_index in state_visit_counts:
                 state_visit_counts[state_index] += 1
             else:
                 state_visit_counts[state_index] = 1
-            # Keeping a list of all past states to use to improve our best_moves
-            past_states.append(state_index)
             # Checking if we are stuck in an infinite loop (only in Non-slippery environments)
             if self.slip == 0 and state_visit_counts[state_index] > 5:
                 all_directions = [0, 1, 2, 3]
                 move_dir = self.best_move_per_cell[state_index]
                 all_directions.remove(move_dir)
-                alternative_direction = random.choice(all_directions)
-                next_state, reward, done = self.step(alternative_direction)
+                alternative_direction = self.explore_draws.choice(all_directions)
+                with metrics.phase("step"):
+                    next_state, reward, done = self.step(alternative_direction)
                 self.set_best_move(state_index, alternative_direction)
+                learner.policy[state_index] = alternative_direction
+                loop_breaks += 1
             else:
-                next_state, reward, done = self.step(self.best_move_per_cell[state_index])
+                with metrics.phase("step"):
+                    next_state, reward, done = self.step(self.best_move_per_cell[state_index])
+            if recorder is not None:
+                recorder.record(state_index, self.best_move_per_cell[state_index], self.last_action, reward, done)
             total_reward += reward
             next_state_index = next_state[0] * self.n + next_state[1]
             # Computing the new Q value for this state
-            # Q_new = Q_old + α(reward + γ(max(Q_next_state.values)) - Q_old)
-            Q[state_index][self.best_move_per_cell[state_index]] = Q[state_index][self.best_move_per_cell[state_index]] +\
-                alpha * (reward + gamma * max(Q[next_state_index].values()) - Q[state_index][self.best_move_per_cell[state_index]])
-
-            time.sleep(0.025)
+            # Q_new = Q_old + α(reward + γ(max(Q_next_state)) - Q_old)
+            if not evaluating:
+                with metrics.phase("q_update"):
+                    learner.update(state_index, self.best_move_per_cell[state_index], reward, next_state_index)
+            if planner is not None and not evaluating:
+                with metrics.phase("planning"):
+                    planner.observe(state_index, self.best_move_per_cell[state_index], self.last_action, reward)
+                    planner.plan()
             counter += 1
 
             if done:  # If we get to a final state, i print the reward and reset the game
-                message = f"Final Reward: {round(total_reward, 2)}"
-                message_2 = "Recalculating best moves"
-
-                for dx, dy in [(x, y) for x in range(-2, 3) for y in range(-2, 3) if x != 0 or y != 0]:
-                    outline_text = outline_font.render(message, True, (0, 0, 0))
-                    outline_text_2 = outline_font.render(message_2, True, (0, 0, 0))
-                    text_rect = outline_text.get_rect(center=(window_size[0] // 2 + dx, window_size[1] // 2 + dy))
-                    text_rect_2 = outline_text.get_rect(center=(window_size[0] // 2 + dx - 35, window_size[1] // 2 + dy + 25))
-                    screen.blit(outline_text, text_rect)
-                    screen.blit(outline_text_2, text_rect_2)
-
-                text = font.render(message, True, red)
-                text_2 = font.render(message_2, True, red)
-                text_rect = text.get_rect(center=(window_size[0] // 2, window_size[1] // 2))
-                text_rect_2 = text.get_rect(center=(window_size[0] // 2 - 35, window_size[1] // 2 + 25))
-                screen.blit(text, text_rect)
-                screen.blit(text_2, text_rect_2)
-
-                pygame.display.flip()
+                final_reward = total_reward
+                metrics.record_episode(counter, final_reward, len(state_visit_counts), loop_breaks)
+                loop_breaks = 0
                 self.reset()
-                print("Reward of this game: \t", total_reward, "\n")
                 total_reward = 0
-                past_states = []
                 state_visit_counts = {}
                 counter = 0
-                for s in range(self.n * self.n):
-                    self.set_best_move(s, max(Q[s], key=Q[s].get))
+                # (also undoes the loop breaker's changes when only evaluating)
+                learner.policy = learner.greedy_policy()
+                learner.sync_env()
+                if evaluating:
+                    evaluation_rewards.append(final_reward)
+                else:
+                    if self.policy_cache is not None:
+                        # In memory only, the disk tier is written once when the game ends
+                        self.policy_cache.put(env_fingerprint(self), learner.policy, learner.Q, persist=False)
+                    if convergence is not None and convergence.update(learner.policy, learner.Q, final_reward):
+                        print(convergence.report())
+                        evaluating = True
+                        if stop_on_convergence:
+                            running = False
+                episodes.append(final_reward)
+                if not turbo and running:
+                    show_final_reward(final_reward)
+
+        def edit_lake(cell, button):
+            """
+            Dynamic lake: changes the clicked cell and replans around it
+            """
+            nonlocal dynamic_lake
+            if dynamic_lake is None:
+                from Dynamic_Lake import DynamicLake
+                dynamic_lake = DynamicLake(self, learner)
+            old_goal = self.goal
+            try:
+                with metrics.phase("replan"):
+                    if button == 3:
+                        dynamic_lake.move_goal(cell)
+                    elif self.holes[cell]:
+                        dynamic_lake.freeze([cell])
+                    elif cell != tuple(self.state):    # Not under the agent
+                        dynamic_lake.melt([cell])
+                    else:
+                        return
+            except ValueError as error:
+                print(error)
+                return
+            renderer.repaint([cell, old_goal])
+            print(f"Lake changed at {cell}, {dynamic_lake.replanned} states replanned")
+
+        def show_final_reward(final_reward):
+            """
+            Shows the reward of the finished game over the board and pauses the agent for a while
+            """
+            message = f"Final Reward: {round(final_reward, 2)}"
+            message_2 = "Evaluating the policy" if evaluating else "Recalculating best moves"
+
+            for dx, dy in [(x, y) for x in range(-2, 3) for y in range(-2, 3) if x != 0 or y != 0]:
+                outline_text = outline_font.render(message, True, (0, 0, 0))
+                outline_text_2 = outline_font.render(message_2, True, (0, 0, 0))
+                text_rect = outline_text.get_rect(center=(window_size[0] // 2 + dx, window_size[1] // 2 + dy))
+                text_rect_2 = outline_text.get_rect(center=(window_size[0] // 2 + dx - 35, window_size[1] // 2 + dy + 25))
+                screen.blit(outline_text, text_rect)
+                screen.blit(outline_text_2, text_rect_2)
+
+            text = font.render(message, True, red)
+            text_2 = font.render(message_2, True, red)
+            text_rect = text.get_rect(center=(window_size[0] // 2, window_size[1] // 2))
+            text_rect_2 = text.get_rect(center=(window_size[0] // 2 - 35, window_size[1] // 2 + 25))
+            screen.blit(text, text_rect)
+            screen.blit(text_2, text_rect_2)
+
+            pygame.display.flip()
+            renderer.invalidate()
+            print("Reward of this game: \t", final_reward, "\n")
+            if not evaluating:
                 self.print_best_actions_grid()
-                pygame.time.wait(269)
-                time.sleep(0.25)
+            scheduler.hold(519)     # The message stays on screen, without blocking the event handling
+
+        episodes = []
+        evaluation_rewards = []
+        background_learner = None
+        tables_version = -1
+        dynamic_lake = None
+        from Frame_Scheduler import FrameScheduler
+        scheduler = FrameScheduler(target_fps, turbo)
+
+        while running:
+            # Render the game state (only the cells that changed), unless a message is shown
+            if not scheduler.paused():
+                with metrics.phase("render"):
+                    renderer.draw()
+
+            if index == 0 and cached_Q is not None:
+                # Map already seen, starting from the learned policy and Q-values
+                index = self.n * self.n
+                self.print_best_actions_grid()
+                learner.seed_from_values(cached_Q)
+
+            elif index == 0 and policy_source == "solver":
+                # Using the exact solver, the Q-values are initialized to the optimal ones
+                Q_optimal = self.solver_best_moves()
+                index = self.n * self.n
+                self.print_best_actions_grid()
+                learner.seed_from_values(Q_optimal)
+
+            elif index == 0:
+                # Using the visual Analyzer
+                with self.metrics.phase("analyzer"):
+                    index = self.analyzer_best_moves(screen, cell_size, offscreen)
+
+                self.print_best_actions_grid()
+                # Initializing Q-values based on the vizual analyzer's best moves
+                learner.seed_from_policy(self.best_move_per_cell)
+
+            if background:
+                # Learning in the other process, drawing its latest snapshot
+                if background_learner is None:
+                    from Background_Learner import BackgroundLearner
+                    background_learner = BackgroundLearner(self, learner)
+                state_index, episodes_done, last_reward, tables_version, Q, policy = \
+                    background_learner.read(tables_version)
+                if policy is not None:
+                    learner.Q[:] = Q
+                    learner.policy = policy
+                    learner.sync_env()
+                self.state = divmod(state_index, self.n)
+                if episodes_done:
+                    pygame.display.set_caption(f'Random Frozen Lake MAP - episode {episodes_done}, '
+                                               f'last reward {round(last_reward, 2)}')
+            else:
+                # Learning: 1 step per frame, or as many as fit into the frame in turbo mode
+                scheduler.run_frame(learning_step)
+                if turbo and episodes:
+                    pygame.display.set_caption(f'Random Frozen Lake MAP - episode {len(episodes)}, '
+                                               f'last reward {round(episodes[-1], 2)}'
+                                               + (' (evaluation)' if evaluating else ''))
 
             # Handle events
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
-
+                elif dynamic and not background and index and event.type == pygame.MOUSEBUTTONDOWN:
+                    cell = renderer.cell_at(event.pos)
+                    if cell is not None and event.button in (1, 3):
+                        edit_lake(cell, event.button)
+
+            with metrics.phase("frame_wait"):
+                scheduler.tick()
+
+        if background_learner is not None:
+            Q, policy = background_learner.stop()
+            learner.Q[:] = Q
+            learner.policy = policy
+            learner.sync_env()
+        if self.policy_cache is not None and (background_learner is not None or episodes):
+            self.policy_cache.put(env_fingerprint(self), learner.policy, learner.Q)
+        if evaluation_rewards:
+            print(f"Evaluation after convergence: {len(evaluation_rewards)} episodes, "
+                  f"mean reward {sum(evaluation_rewards) / len(evaluation_rewards):.2f}")
+        if recorder is not None:
+            recorder.flush()
         pygame.quit()
         sys.exit()
 
-    def player_plays_game(self, cell_size=40):
+    def player_plays_game(self, cell_size=40, policy_source="solver", offscreen=None):
         """
         Used when the "player" option is chosen
         The function initiates the game, the Graphical Interface and the graphical analyzer
@@ -504,28 +703,39 @@ class RandomFrozenLake:
                 They get set from the visual analyzer, who has a good estimate, but
                 if there are mistakes they don't get corrected. It is just a space
                 for the user to try out the Frozen Lake environment / game!!!
+        :param policy_source: "solver" (exact Value Iteration, the default) or "analyzer" (visual analyzer on
+                              a screenshot). Lakes larger than the window (MAX_VIEW_CELLS) always use the solver.
+        :param offscreen: analyze the pygame Surface instead of a screenshot. By default it is used
+                          when win32gui is missing or SDL's video driver is "dummy"
         """
         # initializing Pygame
+        import pygame
         pygame.init()
 
         white = (255, 255, 255)
-        black = (0, 0, 0)
-        lilac = (225,196,255)
         red = (245, 20, 20)
-        blue = (20, 20, 245)
-        green = (20, 245, 20)
 
-        # Setting the display size to be the environment grid and some buffer zone on the screen
-        window_size = ((self.n * cell_size)+40, (self.n * cell_size+2)+40)
+        # Setting the display size to be the (visible part of the) environment grid and some buffer zone on the screen
+        view_cells = min(self.n, MAX_VIEW_CELLS)
+        window_size = ((view_cells * cell_size)+40, (view_cells * cell_size+2)+40)
         screen = pygame.display.set_mode(window_size)
         pygame.display.set_caption('Random Frozen Lake MAP')
 
-        # Moving the window to a specific location on the screen, for the analyzer to be able to see it
-        moving_window = win32gui.FindWindow(None, 'Random Frozen Lake MAP')
-        win32gui.SetWindowPos(moving_window, 0, 80, 80, 0, 0, 0x0001)
+        win32gui = None if offscreen else load_win32gui()
+        if offscreen is None:
+            offscreen = win32gui is None or os.environ.get("SDL_VIDEODRIVER") == "dummy"
+        if not offscreen:
+            # Moving the window to a specific location on the screen, for the analyzer to be able to see it
+            moving_window = win32gui.FindWindow(None, 'Random Frozen Lake MAP')
+            win32gui.SetWindowPos(moving_window, 0, 80, 80, 0, 0, 0x0001)
 
         # Background -> white
         screen.fill(white)
+        from Board_Renderer import BoardRenderer
+        renderer = BoardRenderer(screen, self, cell_size, view_cells=view_cells)
+        if view_cells < self.n and policy_source == "analyzer":
+            # The analyzer needs the whole board on screen, large lakes use the exact solver instead
+            policy_source = "solver"
 
         # Key presses mapping
         key_action_mapping = {
@@ -542,48 +752,24 @@ class RandomFrozenLake:
         total_reward = 0
         index = 0
         while running:
-            # Render the game state
-            screen.fill(white)
-            k = 0
-
-            # Creating the graphical interface
-            for i in range(self.n):
-                for j in range(self.n):
-                    rect_1 = pygame.Rect(j * cell_size + 20, i * cell_size + 20, cell_size, cell_size)
-                    rect_2 = pygame.Rect(j * cell_size + 21, i * cell_size + 21, cell_size - 2, cell_size - 2)
-                    pygame.draw.rect(screen, black, rect_1, 1)
-
-                    if (i, j) == self.state and not self.done:
-                        pygame.draw.rect(screen, green, rect_2)
-                        # Arrows for the best move in the cell we are at, at the moment
-                        best_move = self.best_move_per_cell[k]
-                        draw_arrow(screen, best_move, rect_2)
-                    elif (i, j) == self.goal:
-                        pygame.draw.rect(screen, red, rect_2)
-                    elif (i, j) in self.holes:
-                        pygame.draw.rect(screen, blue, rect_2)
-                    else:
-                        pygame.draw.rect(screen, lilac, rect_2)
-                        # Arrows for the best move in each cell (not including holes and goal since they are END states)
-                        best_move = self.best_move_per_cell[k]
-                        draw_arrow(screen, best_move, rect_2)
+            # Render the game state (only the cells that changed)
+            with self.metrics.phase("render"):
+                renderer.draw()
 
-                    k += 1
+            if index == 0 and self.cached_best_moves() is not None:
+                # Map already seen, using its learned policy
+                index = self.n * self.n
+                self.print_best_actions_grid()
 
-            pygame.display.flip()  # Update the display
+            elif index == 0 and policy_source == "solver":
+                self.solver_best_moves()
+                index = self.n * self.n
+                self.print_best_actions_grid()
 
-            if index == 0:
-                time.sleep(1)
+            elif index == 0:
                 # Using the visual Analyzer
-                Agent_suggestions = GameAnalyzer(self.n, cell_size)
-                image = Agent_suggestions.capture_game_area()           # Getting the screenshot using MSS
-                elements = Agent_suggestions.find_elements(image)       # Proccesing the screenshot using OpenCV
-                best_moves = Agent_suggestions.calculate_best_moves(elements)   # Calculating the best moves using the data gained
-                sorted_positions = sorted(best_moves.keys(), key=lambda position: (position[1], position[0]))
-                ordered_best_moves = {pos: best_moves[pos] for pos in sorted_positions}
-                for pos, move in ordered_best_moves.items():
-                    self.set_best_move(index, move)
-                    index += 1
+                with self.metrics.phase("analyzer"):
+                    index = self.analyzer_best_moves(screen, cell_size, offscreen)
 
                 self.print_best_actions_grid()
 
@@ -594,7 +780,12 @@ class RandomFrozenLake:
                 elif event.type == pygame.KEYDOWN:
                     if event.key in key_action_mapping:
                         # new game state (kainourgia kinisi)
-                        next_state, reward, done = self.step(key_action_mapping[event.key])
+                        state_index = self.state[0] * self.n + self.state[1]
+                        with self.metrics.phase("step"):
+                            next_state, reward, done = self.step(key_action_mapping[event.key])
+                        if self.recorder is not None:
+                            self.recorder.record(state_index, key_action_mapping[event.key], self.last_action,
+                                                 reward, done)
                         total_reward += reward
 
                         if done:  # If we get to a final state, i print the reward and reset the game
@@ -610,12 +801,16 @@ class RandomFrozenLake:
                             screen.blit(text, text_rect)
 
                             pygame.display.flip()
+                            renderer.invalidate()
                             self.reset()
                             print("Reward of this game: \t", total_reward, "\n")
                             total_reward = 0
-                            pygame.time.wait(2069)
-                            time.sleep(2)
+                            with self.metrics.phase("wait"):
+                                pygame.time.wait(2069)
+                                time.sleep(2)
 
+        if self.recorder is not None:
+            self.recorder.flush()
         pygame.quit()
         sys.exit()
 
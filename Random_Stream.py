@@ -0,0 +1,81 @@
+from itertools import islice
+import numpy as np
+
+"""
+File:   Random_Stream.py
+Author: Koutounidis Christos-Angelos
+Description: Block-sampled random numbers for the hot loops. Instead of one call to the random
+             generator per step, the uniforms are drawn in large blocks from a seeded
+             np.random.Generator and handed out one by one, refilling lazily. The same seed
+             always gives the same sequence, so the episodes are reproducible.
+"""
+
+BLOCK_SIZE = 4096
+
+
+class RandomStream:
+    def __init__(self, rng, block_size=BLOCK_SIZE):
+        """
+        :param rng: np.random.Generator that the blocks are drawn from
+        :param block_size: number of uniforms drawn at a time
+        """
+        self.rng = rng
+        self.block_size = block_size
+        self._block = iter(())
+        self._rest = None       # Block interrupted by push_back(), continued after the pending uniforms
+
+    def _next_block(self):
+        if self._rest is not None:
+            self._block, self._rest = self._rest, None
+        else:
+            self._block = iter(self.rng.random(self.block_size).tolist())
+
+    def random(self):
+        """
+        Next uniform draw in [0, 1)
+        """
+        while True:
+            try:
+                return next(self._block)
+            except StopIteration:
+                self._next_block()
+
+    def take(self, count):
+        """
+        Next count uniforms as an array (e.g. for a compiled kernel), the same sequence that
+        count calls of random() would return
+        """
+        head = np.fromiter(islice(self._block, count), dtype=np.float64)
+        if len(head) < count and self._rest is not None:
+            # The pending uniforms ran out, the rest of the interrupted block follows
+            self._next_block()
+            head = np.concatenate((head, np.fromiter(islice(self._block, count - len(head)), dtype=np.float64)))
+        if len(head) == count:
+            return head
+        return np.concatenate((head, self.rng.random(count - len(head))))
+
+    def push_back(self, values):
+        """
+        Returns unused uniforms of take() to the front of the stream. They are kept as the
+        pending block, ahead of the rest of the current one, so the iterators never nest.
+        """
+        values = np.asarray(values).tolist()
+        if self._rest is None:
+            self._block, self._rest = iter(values), self._block
+        else:
+            # Pushed back again before the pending uniforms ran out: one flat pending block
+            self._block = iter(values + list(self._block))
+
+    def choice(self, options):
+        """
+        Uniformly chosen element of a (small) list, like random.choice
+        """
+        return options[int(self.random() * len(options))]
+
+
+def spawn_streams(rng, count, block_size=BLOCK_SIZE):
+    """
+    Independent streams, each on its own child of the Generator, so that the draws of one
+    don't shift the others
+    """
+    return [RandomStream(child, block_size) for child in rng.spawn(count)]
@@ -0,0 +1,166 @@
+import sys
+import time
+import shutil
+import numpy as np
+
+"""
+File:   Terminal_Renderer.py
+Author: Koutounidis Christos-Angelos
+Description: Fast terminal output of the lake. The grids are built as NumPy character arrays:
+             the cells get a code (arrow, goal, hole, agent) and one lookup turns all of them
+             into characters, so no string is built one character at a time, and each grid
+             is written with a single buffered write. The ANSI live mode draws the grid once
+             and then only rewrites the cells that changed since the previous frame, so
+             headless runs can show their progress without the console slowing them down.
+"""
+
+# Cell codes: 0-3 the best move (Up, Left, Down, Right), then no move, goal, hole, agent, free cell
+NO_MOVE, GOAL, HOLE, AGENT, FREE = 4, 5, 6, 7, 8
+SYMBOLS = np.array(['↑', '←', '↓', '→', ' ', 'G', 'X', 'P', ' '])
+
+# ANSI escape sequences
+CLEAR_SCREEN = "\x1b[2J\x1b[H"
+CLEAR_LINE = "\x1b[K"
+CURSOR_HOME = "\x1b[H"
+
+
+def move_codes(best_moves):
+    """
+    Codes of the best moves, from best_move_per_cell (Python ints or None) or an int array
+    """
+    best_moves = np.asarray(best_moves)
+    if best_moves.dtype != object:
+        return best_moves.astype(np.int8)
+    codes = np.full(best_moves.shape, NO_MOVE, dtype=np.int8)
+    known = np.not_equal(best_moves, None)      # Elementwise on the object array
+    codes[known] = best_moves[known].astype(np.int8)
+    return codes
+
+
+def to_text(chars):
+    """
+    Joins a contiguous character array into one string (without a Python loop)
+    """
+    chars = np.ascontiguousarray(chars).reshape(-1)
+    return chars.view(np.dtype(("U", chars.size)))[0] if chars.size else ""
+
+
+def best_actions_text(env, best_moves=None):
+    """
+    The best actions grid, one row per line and the cells separated by spaces
+    :param best_moves: best move of each cell (the environment's best_move_per_cell by default)
+    """
+    n = env.n
+    codes = move_codes(env.best_move_per_cell if best_moves is None else best_moves).reshape(n, n)
+    codes[env.goal] = GOAL
+    codes[env.holes.astype(bool)] = HOLE
+    chars = np.full((n, 2 * n), ' ')
+    chars[:, 0::2] = SYMBOLS[codes]
+    chars[:, -1] = '\n'
+    return to_text(chars)
+
+
+def map_text(env):
+    """
+    The map with the agent (P), the goal (G) and the holes (X), inside a frame
+    """
+    n = env.n
+    codes = np.where(env.holes.astype(bool), HOLE, FREE).astype(np.int8)
+    codes[env.goal] = GOAL
+    codes[tuple(env.state)] = AGENT
+    chars = np.full((n, 3 * n + 2), ' ')
+    chars[:, 0] = '|'
+    chars[:, 1:3 * n - 1:3] = SYMBOLS[codes]
+    chars[:, 3 * n] = '|'
+    chars[:, -1] = '\n'
+    return " " + "_" * (3 * n - 1) + "\n" + to_text(chars) + " " + "‾" * (3 * n - 1) + "\n"
+
+
+class TerminalRenderer:
+    def __init__(self, env, stream=None, min_interval=0.05):
+        """
+        ANSI live view of the best moves and the agent, for terminals with escape sequences.
+        Lakes bigger than the terminal are cut to the part that fits.
+        :param env: RandomFrozenLake environment (with its holes generated)
+        :param stream: output text stream (sys.stdout by default)
+        :param min_interval: minimum seconds between two frames, draw() skips the frames in between
+        """
+        self.env = env
+        self.stream = sys.stdout if stream is None else stream
+        self.min_interval = min_interval
+        columns, lines = shutil.get_terminal_size()
+        self.rows = max(1, min(env.n, lines - 2))
+        self.cols = max(1, min(env.n, columns // 2))
+        self.drawn = None
+        self.drawn_at = 0.0
+        self.frames = 0
+
+    def codes(self, best_moves=None, agent_state=None):
+        """
+        Codes of the visible cells: best moves, goal, holes and the agent
+        """
+        env = self.env
+        codes = move_codes(env.best_move_per_cell if best_moves is None else best_moves).reshape(env.n, env.n)
+        codes[env.goal] = GOAL
+        codes[env.holes.astype(bool)] = HOLE
+        if agent_state is not None:
+            codes[divmod(int(agent_state), env.n)] = AGENT
+        return codes[:self.rows, :self.cols]
+
+    def draw(self, best_moves=None, agent_state=None, status="", force=False):
+        """
+        Draws a frame: the whole grid the first time, afterwards only the cells that changed
+        (with cursor movements) and the status line under the grid. Returns False if the frame
+        was skipped because of min_interval.
+        :param best_moves: best move of each cell, e.g. a learner's policy (best_move_per_cell by default)
+        :param agent_state: flat index of the agent's cell, or None
+        :param status: text shown under the grid
+        """
+        now = time.perf_counter()
+        if not force and self.drawn is not None and now - self.drawn_at < self.min_interval:
+            return False
+        codes = self.codes(best_moves, agent_state)
+        rows, cols = (codes != self.drawn).nonzero() if self.drawn is not None else (None, None)
+        if self.drawn is None or len(rows) > codes.size // 5:
+            # First frame, or so many changes that the whole grid is shorter than the cursor movements
+            chars = np.full((self.rows, 2 * self.cols), ' ')
+            chars[:, 0::2] = SYMBOLS[codes]
+            chars[:, -1] = '\n'
+            parts = [CLEAR_SCREEN if self.drawn is None else CURSOR_HOME, to_text(chars)]
+        else:
+            # Cursor positions are 1-based, every cell is 2 columns wide
+            parts = [f"\x1b[{row + 1};{2 * col + 1}H{symbol}"
+                     for row, col, symbol in zip(rows.tolist(), cols.tolist(), SYMBOLS[codes[rows, cols]].tolist())]
+        parts.append(f"\x1b[{self.rows + 1};1H{status}{CLEAR_LINE}\n")
+        self.stream.write("".join(parts))
+        self.stream.flush()
+        self.drawn = codes
+        self.drawn_at = now
+        self.frames += 1
+        return True
+
+
+def train_live(learner, episodes, max_steps=None, renderer=None, batches=200, monitor=None):
+    """
+    QLearner.train with the ANSI live view: the episodes run in batches and the learner's
+    policy is drawn after each one. Returns the total reward of every episode played.
+    :param renderer: TerminalRenderer of the learner's environment (a new one by default)
+    :param batches: number of batches the episodes are split into
+    :param monitor: ConvergenceMonitor, the training stops when it converges
+    """
+    renderer = TerminalRenderer(learner.env) if renderer is None else renderer
+    batch = max(1, episodes // batches)
+    episode_rewards = []
+    played = 0
+    while played < episodes:
+        count = min(batch, episodes - played)
+        episode_rewards.append(learner.train(count, max_steps, monitor))
+        played += len(episode_rewards[-1])
+        converged = monitor is not None and monitor.converged
+        renderer.draw(learner.policy, status=f"episode {played}/{episodes}, "
+                                             f"mean reward {episode_rewards[-1].mean():.2f}"
+                                             + (", converged" if converged else ""),
+                      force=played == episodes or converged)
+        if converged:
+            break
+    return np.concatenate(episode_rewards) if episode_rewards else np.empty(0)
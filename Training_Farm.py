@@ -0,0 +1,114 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from RandomFrozenLake import RandomFrozenLake
+from Q_Learner import QLearner, load_settings
+from Convergence import ConvergenceMonitor
+
+"""
+File:   Training_Farm.py
+Author: Koutounidis Christos-Angelos
+Description: Multi-process training farm. Independent (map, seed, slip) jobs are given to a pool
+             of worker processes, each one running the headless Random Frozen Lake + Q-learning
+             loop. The results (per-episode reward, success, episodes and seconds to convergence)
+             are streamed back and merged into one columnar file.
+"""
+
+
+def make_jobs(n_maps, n_seeds, slips=(0, 1, 2), root_seed=0):
+    """
+    Creates the (job_id, map_seed, seed, slip) jobs, every map with every learning seed and slip.
+    The seeds are derived from the root seed, so the same root always gives the same jobs.
+    """
+    map_seeds = np.random.SeedSequence(root_seed).generate_state(n_maps)
+    learning_seeds = np.random.SeedSequence([root_seed, 1]).generate_state(n_seeds)
+    jobs = []
+    for map_seed in map_seeds:
+        for seed in learning_seeds:
+            for slip in slips:
+                jobs.append((len(jobs), int(map_seed), int(seed), slip))
+    return jobs
+
+
+def build_env(map_seed, slip, settings=None):
+    """
+    Creates the same random map for the same (map_seed, slip)
+    :param settings: Q-learning settings of the slip level (the ones play_game loads by default)
+    """
+    settings = load_settings()[slip] if settings is None else settings
+    env = RandomFrozenLake(seed=map_seed)
+    env.slip = slip
+    env.gamma = settings["gamma"]
+    env.alpha = settings["alpha"]
+    env.holes = env.generate_holes()
+    env.compile_model()
+    return env
+
+
+def run_job(job, episodes, patience=50, policy_source="solver", early_stop=False):
+    """
+    Worker: trains a Q-learner on one map and returns its per-episode results.
+    :param job: (job_id, map_seed, seed, slip)
+    :param episodes: number of episodes to play
+    :param patience: the policy has converged when it doesn't change for this many episodes
+    :param policy_source: "solver" (the exact solver's Q-values, as the GUI agent is seeded) or "zero" (all Q = 0)
+    :param early_stop: the job ends as soon as the policy converges, instead of playing all the episodes
+    """
+    job_id, map_seed, seed, slip = job
+    settings = load_settings()[slip]
+    env = build_env(map_seed, slip, settings)
+    learner = QLearner(env, settings["gamma"], settings["alpha"], settings["bonus"])
+    if policy_source == "solver":
+        from Policy_Solver import value_iteration
+        learner.seed_from_values(value_iteration(env, settings["gamma"])[2])
+
+    env.seed_dynamics(seed)
+    rewards = np.empty(episodes)
+    successes = np.empty(episodes, dtype=bool)
+    # Started without the initial policy: the first episode counts as a change
+    monitor = ConvergenceMonitor(stable_episodes=patience)
+    monitor.start()
+    played = episodes
+    max_steps = 100 * learner.n_states
+    for episode in range(episodes):
+        rewards[episode] = learner.run_episode(max_steps)
+        successes[episode] = learner.reached_goal
+        if monitor.update(learner.policy, None, rewards[episode]) and early_stop:
+            played = episode + 1
+            break
+    converged = monitor.converged
+    return {"job_id": job_id, "map_seed": map_seed, "seed": seed, "slip": slip, "n": env.n,
+            "rewards": rewards[:played], "successes": successes[:played],
+            "episodes_to_convergence": monitor.episodes_to_convergence if converged else -1,
+            "seconds_to_convergence": monitor.seconds_to_convergence if converged else np.nan}
+
+
+def run_farm(jobs, episodes, max_workers=None, **job_options):
+    """
+    Runs all the jobs on a process pool (every core by default) and yields the results
+    as soon as each job finishes
+    """
+    max_workers = os.cpu_count() if max_workers is None else max_workers
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(run_job, job, episodes, **job_options) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def merge_results(results, path):
+    """
+    Merges the job results into one columnar ".npz" file: one row per (job, episode),
+    plus one row per job for the episodes to convergence
+    """
+    results = sorted(results, key=lambda result: result["job_id"])
+    episodes = [len(result["rewards"]) for result in results]
+    columns = {
+        "job_id": np.repeat([result["job_id"] for result in results], episodes),
+        "episode": np.concatenate([np.arange(count) for count in episodes]),
+        "reward": np.concatenate([result["rewards"] for result in results]),
+        "success": np.concatenate([result["successes"] for result in results]),
+    }
+    for key in ("job_id", "map_seed", "seed", "slip", "n", "episodes_to_convergence", "seconds_to_convergence"):
+        columns["jobs_" + key] = np.array([result[key] for result in results])
+    np.savez_compressed(path, **columns)
+    return columns
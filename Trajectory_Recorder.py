@@ -0,0 +1,119 @@
+import os
+import queue
+import threading
+import numpy as np
+
+"""
+File:   Trajectory_Recorder.py
+Author: Koutounidis Christos-Angelos
+Description: Compact recorder of the played transitions (episode, state, intended action,
+             actual action, reward, done). They are written into preallocated structured
+             NumPy buffers, and every full buffer is appended to a raw file by a background
+             thread while the other buffer keeps filling (double buffering), so recording
+             doesn't allocate or wait on the disk at every step. The file can be opened again
+             as a memory-mapped array, for the offline analysis of very long runs.
+"""
+
+# One transition, 16 bytes on disk (little-endian, padded). state is the flat state index
+# (row * n + col) before the step, intended the inputed action and actual the REAL action.
+TRANSITION_DTYPE = np.dtype({
+    "names": ["episode", "state", "intended", "actual", "reward", "done"],
+    "formats": ["<u4", "<u4", "u1", "u1", "<f4", "?"],
+    "offsets": [0, 4, 8, 9, 10, 14],
+    "itemsize": 16,
+})
+
+
+def load_trajectories(path):
+    """
+    Memory-mapped (read-only) view of a recorded file, with the fields of TRANSITION_DTYPE
+    """
+    if os.path.getsize(path) == 0:
+        return np.zeros(0, dtype=TRANSITION_DTYPE)
+    return np.memmap(path, dtype=TRANSITION_DTYPE, mode="r")
+
+
+class TrajectoryRecorder:
+    def __init__(self, path, chunk_size=1 << 16):
+        """
+        :param path: append-only file of the transitions (created if missing). Recording into an
+                     existing file continues its episode numbering.
+        :param chunk_size: transitions per buffer, each full buffer is one write to the file
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.buffers = [np.zeros(chunk_size, dtype=TRANSITION_DTYPE) for _ in range(2)]
+        self.free = [threading.Event(), threading.Event()]     # Set when the buffer may be filled
+        for event in self.free:
+            event.set()
+        self.active = 0
+        self.buffer = self.buffers[0]
+        self.position = 0
+        self.episode = 0
+        self.recorded = 0
+        if os.path.exists(path) and os.path.getsize(path) >= TRANSITION_DTYPE.itemsize:
+            last = load_trajectories(path)[-1]
+            self.episode = int(last["episode"]) + bool(last["done"])
+
+        self.file = open(path, "ab")
+        self.chunks = queue.Queue()
+        self.writer = threading.Thread(target=self._write_chunks, name="TrajectoryRecorder", daemon=True)
+        self.writer.start()
+
+    def record(self, state, intended, actual, reward, done):
+        """
+        Adds one transition to the active buffer. An episode ends at the transition with done.
+        """
+        self.buffer[self.position] = (self.episode, state, intended, actual, reward, done)
+        self.position += 1
+        if done:
+            self.episode += 1
+        if self.position == self.chunk_size:
+            self._swap()
+
+    def _swap(self):
+        """
+        Hands the active buffer to the writer thread and continues in the other one (waiting
+        only if the disk is slower than the recording and that buffer isn't written yet)
+        """
+        self.free[self.active].clear()
+        self.chunks.put((self.active, self.position))
+        self.recorded += self.position
+        self.active ^= 1
+        self.buffer = self.buffers[self.active]
+        self.position = 0
+        self.free[self.active].wait()
+
+    def _write_chunks(self):
+        while True:
+            chunk = self.chunks.get()
+            if chunk is None:
+                break
+            index, count = chunk
+            self.file.write(self.buffers[index][:count].data)
+            self.file.flush()
+            self.free[index].set()
+
+    def flush(self):
+        """
+        Writes everything recorded so far to the file (blocking)
+        """
+        if self.position:
+            self._swap()
+        for event in self.free:
+            event.wait()
+
+    def close(self):
+        self.flush()
+        self.chunks.put(None)
+        self.writer.join()
+        self.file.close()
+
+    def __len__(self):
+        return self.recorded + self.position
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
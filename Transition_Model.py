@@ -0,0 +1,126 @@
+from bisect import bisect_right
+import numpy as np
+from VectorFrozenLake import MOVES, ACTION_CHOICES, SLIP_PROBABILITIES, HOLE_REWARD, GOAL_REWARD, STEP_REWARD
+
+"""
+File:   Transition_Model.py
+Author: Koutounidis Christos-Angelos
+Description: Compiled model of a single Frozen Lake map. The dynamics of step() are computed
+             once into flat tables, so stepping becomes one uniform draw and one array index.
+             Solvers and evaluators can use the same tables instead of re-simulating the
+             environment. When a few cells change (dynamic lake), only the rows of the states
+             next to them are recomputed.
+"""
+
+
+class TransitionModel:
+    def __init__(self, n, goal, holes, slip):
+        """
+        :param n: grid size
+        :param goal: goal cell (row, col)
+        :param holes: n x n grid of the holes (non-zero where there is a hole)
+        :param slip: slip level (0, 1 or 2)
+        """
+        self.n = n
+        self.n_states = n * n
+        self.goal = goal
+        self.slip = slip
+
+        # Unknown slip levels are deterministic, exactly like RandomFrozenLake.step()
+        self.probabilities = SLIP_PROBABILITIES[slip if slip in (0, 1, 2) else 0]
+        self.cumulative_probabilities = np.cumsum(self.probabilities)
+        self._cumulative = self.cumulative_probabilities.tolist()
+
+        self.hole_grid = np.asarray(holes, dtype=bool)
+        goal_grid = np.zeros((n, n), dtype=bool)
+        goal_grid[goal] = True
+
+        # Final (END) states, the holes and the goal
+        self.terminal = (self.hole_grid | goal_grid).ravel()
+
+        # Every (state, inputed action, slip outcome) -> next state, reward and done flag
+        self.final_actions = ACTION_CHOICES.tolist()                    # [4, 3] REAL actions
+        new_rows, new_cols = self.landing_cells(np.arange(self.n_states))
+        # int32 indices, half the memory of the default int64 on lakes with millions of states
+        self.next_state = (new_rows * n + new_cols).astype(np.int32)   # [n*n, 4, 3]
+
+        in_hole = self.hole_grid[new_rows, new_cols]
+        at_goal = goal_grid[new_rows, new_cols]
+        self.rewards = np.where(in_hole, HOLE_REWARD, np.where(at_goal, GOAL_REWARD, STEP_REWARD))
+        self.done = in_hole | at_goal
+
+    def landing_cells(self, states):
+        """
+        Rows and columns reached from the given states by every (inputed action, slip outcome),
+        each of shape [len(states), 4, 3]
+        """
+        rows, cols = np.divmod(states, self.n)
+        new_rows = np.clip(rows[:, None, None] + MOVES[ACTION_CHOICES, 0], 0, self.n - 1)
+        new_cols = np.clip(cols[:, None, None] + MOVES[ACTION_CHOICES, 1], 0, self.n - 1)
+        return new_rows, new_cols
+
+    def update_cells(self, cells, holes, goal):
+        """
+        Local recompilation after some cells of the map changed (holes melting or freezing,
+        the goal moving): only the changed cells and their neighbours, the states that can
+        land on them, are recomputed.
+        :param cells: the changed cells [(row, col), ...] (the old and new goal when it moves)
+        :param holes: the new n x n grid of the holes
+        :param goal: the new goal cell (row, col)
+        :return: flat indices of the recomputed states
+        """
+        n = self.n
+        rows, cols = np.asarray(cells, dtype=np.int64).reshape(-1, 2).T
+        self.hole_grid[rows, cols] = np.asarray(holes)[rows, cols] != 0
+        self.goal = goal
+        self.terminal[rows * n + cols] = self.hole_grid[rows, cols] | ((rows == goal[0]) & (cols == goal[1]))
+
+        # The changed cells themselves (moves into a wall stay in place) and their neighbours
+        near_rows = np.clip(rows[:, None] + MOVES[:, 0], 0, n - 1)
+        near_cols = np.clip(cols[:, None] + MOVES[:, 1], 0, n - 1)
+        states = np.unique(np.concatenate((rows * n + cols, (near_rows * n + near_cols).ravel())))
+
+        new_rows, new_cols = self.landing_cells(states)
+        in_hole = self.hole_grid[new_rows, new_cols]
+        at_goal = (new_rows == goal[0]) & (new_cols == goal[1])
+        self.rewards[states] = np.where(in_hole, HOLE_REWARD, np.where(at_goal, GOAL_REWARD, STEP_REWARD))
+        self.done[states] = in_hole | at_goal
+        return states
+
+    @classmethod
+    def from_env(cls, env):
+        """
+        Compiles the current map of a RandomFrozenLake environment
+        """
+        return cls(env.n, env.goal, env.holes, env.slip)
+
+    def slip_outcome(self, draw):
+        """
+        Returns which of the 3 possible REAL actions a uniform draw in [0, 1) selects
+        (same sampling rule as np.random.choice)
+        """
+        return min(bisect_right(self._cumulative, draw), 2)
+
+    def sample(self, state_index, action, draw):
+        """
+        Table-lookup step. Returns the next state index, the reward and the done flag
+        :param state_index: current flat state index (row * n + col)
+        :param action: inputed action
+        :param draw: uniform random number in [0, 1)
+        """
+        return self.outcome(state_index, action, self.slip_outcome(draw))
+
+    def outcome(self, state_index, action, k):
+        """
+        Next state index, reward and done flag when the slip outcome k (0, 1 or 2) happens.
+        The REAL action taken is final_actions[action][k].
+        """
+        return (int(self.next_state[state_index, action, k]),
+                float(self.rewards[state_index, action, k]),
+                bool(self.done[state_index, action, k]))
+
+    def expected_rewards(self):
+        """
+        Expected immediate reward of every (state, action), shape [n*n, 4]
+        """
+        return self.rewards @ self.probabilities
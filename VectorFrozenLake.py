@@ -0,0 +1,129 @@
+import numpy as np
+
+"""
+File:   VectorFrozenLake.py
+Author: Koutounidis Christos-Angelos
+Description: Headless, batched version of the Random Frozen Lake environment.
+             It holds many maps as stacked arrays and advances all of them with
+             a single NumPy call, using the same dynamics as RandomFrozenLake.step()
+"""
+
+# Available moves, indexed by action: Up, Left, Down, Right
+MOVES = np.array([(-1, 0), (0, -1), (1, 0), (0, 1)], dtype=np.int64)
+
+# Possible REAL actions for each inputed action (same order as RandomFrozenLake.step())
+ACTION_CHOICES = np.array([
+    [0, 1, 3],      # Up (↑)    -> Up (↑), Left (←), Right (→)
+    [1, 2, 0],      # Left (←)  -> Left (←), Down (↓), Up (↑)
+    [2, 1, 3],      # Down (↓)  -> Down (↓), Left (←), Right (→)
+    [3, 2, 0],      # Right (→) -> Right (→), Down (↓), Up (↑)
+], dtype=np.int64)
+
+# Slip probabilities for each slip level (Deterministic, Slippery, Very slippery)
+SLIP_PROBABILITIES = np.array([
+    [1.0, 0.0, 0.0],
+    [0.7, 0.15, 0.15],
+    [0.4, 0.3, 0.3],
+])
+
+HOLE_REWARD = -20
+GOAL_REWARD = 100
+STEP_REWARD = -0.1
+
+
+class VectorFrozenLake:
+    def __init__(self, n, goals, holes, slip, seed=None):
+        """
+        :param n: grid size of each environment, shape (num_envs,)
+        :param goals: goal cell (row, col) of each environment, shape (num_envs, 2)
+        :param holes: boolean hole masks, shape (num_envs, size, size) with size >= max(n)
+        :param slip: slip level (0, 1 or 2) of each environment, shape (num_envs,)
+        :param seed: seed for the random generator used for the slips
+        """
+        self.n = np.asarray(n, dtype=np.int64)
+        self.num_envs = len(self.n)
+        self.goals = np.asarray(goals, dtype=np.int64).reshape(self.num_envs, 2)
+        self.holes = np.asarray(holes, dtype=bool)
+        self.slip = np.asarray(slip, dtype=np.int64)
+        self.rng = np.random.default_rng(seed)
+
+        # Unknown slip levels are deterministic, exactly like RandomFrozenLake.step()
+        slip_level = np.where((self.slip >= 0) & (self.slip <= 2), self.slip, 0)
+        self.cumulative_probabilities = np.cumsum(SLIP_PROBABILITIES[slip_level], axis=1)
+
+        self.env_index = np.arange(self.num_envs)
+        self.rows = np.zeros(self.num_envs, dtype=np.int64)
+        self.cols = np.zeros(self.num_envs, dtype=np.int64)
+        self.done = np.zeros(self.num_envs, dtype=bool)
+        self.last_actions = np.zeros(self.num_envs, dtype=np.int64)
+
+    @classmethod
+    def from_envs(cls, envs, seed=None):
+        """
+        Stacks already created RandomFrozenLake environments (with their holes generated)
+        into one batched environment. Maps of different sizes are padded to the largest one.
+        """
+        size = max(env.n for env in envs)
+        holes = np.zeros((len(envs), size, size), dtype=bool)
+        for i, env in enumerate(envs):
+            holes[i, :env.n, :env.n] = env.holes
+        return cls(n=[env.n for env in envs],
+                   goals=[env.goal for env in envs],
+                   holes=holes,
+                   slip=[env.slip for env in envs],
+                   seed=seed)
+
+    @property
+    def states(self):
+        """
+        Current (row, col) of every environment, shape (num_envs, 2)
+        """
+        return np.stack((self.rows, self.cols), axis=1)
+
+    @property
+    def state_index(self):
+        """
+        Current flat state index (row * n + col) of every environment
+        """
+        return self.rows * self.n + self.cols
+
+    def reset(self):
+        """
+        Resets every environment to the starting state
+        """
+        self.rows[:] = 0
+        self.cols[:] = 0
+        self.done[:] = False
+        return self.states
+
+    def step(self, actions):
+        """
+        Advances all the environments by one step.
+        It returns the reached states, rewards and done flags. The environments that reached
+        a final state (hole or goal) are automatically reset to the start afterwards, so the
+        returned states are the final ones, while self.states is already the new start.
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+
+        # Action based on slip probabilities (same sampling rule as np.random.choice)
+        draws = self.rng.random(self.num_envs)
+        slip_choice = np.minimum((self.cumulative_probabilities <= draws[:, None]).sum(axis=1), 2)
+        final_actions = ACTION_CHOICES[actions, slip_choice]
+        moves = MOVES[final_actions]
+
+        # Calculate new positions
+        self.rows = np.clip(self.rows + moves[:, 0], 0, self.n - 1)
+        self.cols = np.clip(self.cols + moves[:, 1], 0, self.n - 1)
+        self.last_actions = final_actions
+
+        # Check for holes and goals
+        in_hole = self.holes[self.env_index, self.rows, self.cols]
+        at_goal = (self.rows == self.goals[:, 0]) & (self.cols == self.goals[:, 1])
+        rewards = np.where(in_hole, HOLE_REWARD, np.where(at_goal, GOAL_REWARD, STEP_REWARD))
+        self.done = in_hole | at_goal
+        states = self.states
+
+        # Automatic reset of the finished environments
+        self.rows[self.done] = 0
+        self.cols[self.done] = 0
+        return states, rewards, self.done.copy()
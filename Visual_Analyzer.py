@@ -1,6 +1,10 @@
-from mss import mss
 import cv2
 import numpy as np
+from Instrumentation import NO_INSTRUMENTATION
+try:
+    from mss import mss
+except ImportError:     # Not needed for the offscreen (pygame Surface) analyzer
+    mss = None
 
 """
 File:   Visual_Analyzer.py
@@ -10,8 +14,12 @@ Description: Functions for the vizual analyzer
 
 
 class GameAnalyzer:
-    def __init__(self, n, cell_size):
+    def __init__(self, n, cell_size, metrics=NO_INSTRUMENTATION):
+        """
+        :param metrics: optional Instrumentation, recording the time of each analyzer stage
+        """
         self.n = n
+        self.metrics = metrics
         self.cell_size = cell_size
         self.window_size = ((n * cell_size) + 40, (n * cell_size + 2) + 40)
         # Defining the RGB colors for the game elements, that the visual analyzer will use
@@ -37,6 +45,28 @@ class GameAnalyzer:
 
             return img
 
+    def capture_surface(self, surface):
+        """
+        Zero-copy RGB view (height, width, 3) of a rendered pygame Surface, used instead of a
+        screenshot when the game runs offscreen (e.g. under SDL's dummy video driver).
+        The Surface stays locked while the returned view is alive.
+        """
+        import pygame
+        return pygame.surfarray.pixels3d(surface).transpose(1, 0, 2)
+
+    def analyze_surface(self, surface):
+        """
+        Runs the whole analysis in-process on a rendered pygame Surface (no window positioning,
+        no sleep and no screenshot) and returns the best moves, like calculate_best_moves
+        """
+        with self.metrics.phase("analyzer_capture"):
+            img = self.capture_surface(surface)
+        with self.metrics.phase("analyzer_find_elements"):
+            elements = self.find_elements(img)
+        del img     # Unlocking the Surface
+        with self.metrics.phase("analyzer_best_moves"):
+            return self.calculate_best_moves(elements)
+
     def find_elements(self, img):
         """
         This function detects game elements based on their color and returns their positions
@@ -46,7 +76,12 @@ class GameAnalyzer:
             # Creating a mask for the current color
             lower = np.array(value, dtype="uint8")
             upper = np.array(value, dtype="uint8")
-            mask = cv2.inRange(img, lower, upper)
+            if img.flags['C_CONTIGUOUS']:
+                mask = cv2.inRange(img, lower, upper)
+            else:
+                # Strided views (e.g. a pygame Surface) are compared in place, without copying them
+                match = (img[..., 0] == value[0]) & (img[..., 1] == value[1]) & (img[..., 2] == value[2])
+                mask = match.view(np.uint8) * np.uint8(255)
             elements[key] = mask
 
         return elements
@@ -70,7 +105,8 @@ class GameAnalyzer:
         """
         This function returns the position of all the adjacent cells of the given cell
         """
-        deltas = {0: (0, -40), 1: (-40, 0), 2: (0, 40), 3: (40, 0)}
+        size = self.cell_size
+        deltas = {0: (0, -size), 1: (-size, 0), 2: (0, size), 3: (size, 0)}
         delta = deltas[direction]
         return (pos[0] + delta[0], pos[1] + delta[1])
 
@@ -82,75 +118,80 @@ class GameAnalyzer:
         opposite_pairs = {(0, 2), (2, 0), (1, 3), (3, 1)}
         return (dir1, dir2) in opposite_pairs or (dir2, dir1) in opposite_pairs
 
+    def grid_indices(self, positions, origin):
+        """
+        Maps the pixel centers of the cells to (row, col) grid indices, relative to the origin cell
+        """
+        xy = np.array(positions, dtype=np.int64).reshape(-1, 2)
+        cols = np.rint((xy[:, 0] - origin[0]) / self.cell_size).astype(np.int64)
+        rows = np.rint((xy[:, 1] - origin[1]) / self.cell_size).astype(np.int64)
+        return rows, cols
+
     def calculate_best_moves(self, elements):
         """
         Used to visually determine the best moves for each cell, to move towards the Goal.
         Implements avoidance of holes and edges.
+        The cell centers are mapped to grid indices once, so every neighbour check is an array
+        lookup instead of a search in the lists of positions.
         """
         goal_pos = self.get_positions(elements['goal'])[0]
         hole_positions = self.get_positions(elements['holes'])
         combined_positions = elements['available'] + elements['holes'] + elements['player'] + elements['goal']
         available_positions = self.get_positions(combined_positions)
 
-        directions = {}
-        for position in available_positions:
-            dx = goal_pos[0] - position[0]
-            dy = goal_pos[1] - position[1]
-
-            # Checking for holes around the current position and if the position is on the edge
-            hole_up = (position[0], position[1] - 40) in hole_positions
-            hole_down = (position[0], position[1] + 40) in hole_positions
-            hole_left = (position[0] - 40, position[1]) in hole_positions
-            hole_right = (position[0] + 40, position[1]) in hole_positions
-
-            top_edge = (position[0], position[1] - 40) not in available_positions
-            bottom_edge = (position[0], position[1] + 40) not in available_positions
-            left_edge = (position[0] - 40, position[1]) not in available_positions
-            right_edge = (position[0] + 40, position[1]) not in available_positions
-
-            if abs(dx) > abs(dy):
-                direction = 3 if dx >= 0 else 1  # Right or LEFT
-            else:
-                direction = 2 if dy >= 0 else 0  # UP or Down
-
-            # Many if checks (THAT WORK :) !) after trial and error
-            if abs(dx) > abs(dy):
-                if not (hole_up or top_edge) and not (hole_down or bottom_edge) and not \
-                        (hole_right or right_edge) and not (hole_left or left_edge):
-                    direction = 3 if dx >= 0 else 1  # Right or LEFT
-                elif dx >= 0:
-                    direction = 3 if not (hole_right or right_edge) else (2 if not (hole_down or bottom_edge) else
-                                                                          (0 if not (hole_up or top_edge) else 1))
-                else:
-                    direction = 1 if not (hole_left or left_edge) else (2 if not (hole_down or bottom_edge) else
-                                                                        (0 if not (hole_up or top_edge) else 3))
-            else:
-                if not (hole_up or top_edge) and not (hole_down or bottom_edge) and not \
-                        (hole_right or right_edge) and not (hole_left or left_edge):
-                    direction = 2 if dy >= 0 else 0  # Down or UP
-                elif dy >= 0:
-                    direction = 2 if not (hole_down or bottom_edge) else (3 if not (hole_right or right_edge) else
-                                                                          (1 if not (hole_left or left_edge) else 0))
-                else:
-                    direction = 0 if not (hole_up or top_edge) else (3 if not (hole_right or right_edge) else
-                                                                     (1 if not (hole_left or left_edge) else 2))
-
-            directions[position] = direction
-
+        # Boolean grids of the available cells and holes, with a 1 cell border (the edges)
+        xy = np.array(available_positions, dtype=np.int64)
+        origin = (xy[:, 0].min(), xy[:, 1].min())
+        rows, cols = self.grid_indices(available_positions, origin)
+        rows += 1
+        cols += 1
+        available = np.zeros((rows.max() + 2, cols.max() + 2), dtype=bool)
+        available[rows, cols] = True
+        holes = np.zeros_like(available)
+        if hole_positions:
+            hole_rows, hole_cols = self.grid_indices(hole_positions, origin)
+            holes[hole_rows + 1, hole_cols + 1] = True
+
+        # Checking for holes around each position and if the position is on the edge
+        blocked = holes | ~available
+        up = blocked[rows - 1, cols]
+        down = blocked[rows + 1, cols]
+        left = blocked[rows, cols - 1]
+        right = blocked[rows, cols + 1]
+        all_free = ~up & ~down & ~right & ~left
+
+        dx = goal_pos[0] - xy[:, 0]
+        dy = goal_pos[1] - xy[:, 1]
+
+        # Many if checks (THAT WORK :) !) after trial and error
+        horizontal = np.where(all_free, np.where(dx >= 0, 3, 1),       # Right or LEFT
+                              np.where(dx >= 0,
+                                       np.where(~right, 3, np.where(~down, 2, np.where(~up, 0, 1))),
+                                       np.where(~left, 1, np.where(~down, 2, np.where(~up, 0, 3)))))
+        vertical = np.where(all_free, np.where(dy >= 0, 2, 0),         # Down or UP
+                            np.where(dy >= 0,
+                                     np.where(~down, 2, np.where(~right, 3, np.where(~left, 1, 0))),
+                                     np.where(~up, 0, np.where(~right, 3, np.where(~left, 1, 2)))))
+        direction = np.where(np.abs(dx) > np.abs(dy), horizontal, vertical)
+
+        # Fixing the infinite loops, in the same order as the positions were found.
+        # Flat grid indices: UP, LEFT, DOWN, RIGHT neighbours are at -width, -1, +width, +1
+        width = available.shape[1]
+        offsets = (-width, -1, width, 1)
+        cells = (rows * width + cols).tolist()
+        passable = (available & ~holes).ravel().tolist()
+        grid_direction = np.zeros(available.size, dtype=np.int64)
+        grid_direction[cells] = direction
+        grid_direction = grid_direction.tolist()
         for i in range(4):
-            for pos, move_dir in directions.items():
-                adj_pos = self.get_adjacent_position(pos, move_dir)
+            for cell in cells:
+                move_dir = grid_direction[cell]
+                adj_cell = cell + offsets[move_dir]
 
                 # Checking if the adjacent cell is within the bounds and not a hole
-                if adj_pos in available_positions and adj_pos not in hole_positions:
-                    adj_direction = directions.get(adj_pos)
+                if passable[adj_cell]:
                     # If the adjacent cell's direction points back to the current cell (infinite loop), it gets changed
-                    if self.is_opposite_direction(move_dir, adj_direction):
-                        all_directions = [0, 1, 2, 3]
-                        all_directions.remove(move_dir)
-                        alternative_direction = move_dir + 1 if (move_dir != 3) else 0
-                        directions[pos] = alternative_direction
-
-        return directions
-
+                    if abs(move_dir - grid_direction[adj_cell]) == 2:
+                        grid_direction[cell] = move_dir + 1 if (move_dir != 3) else 0
 
+        return {position: grid_direction[cell] for position, cell in zip(available_positions, cells)}
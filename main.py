@@ -1,15 +1,279 @@
-from RandomFrozenLake import RandomFrozenLake
+import os
+import sys
+import time
+import argparse
+import subprocess
 
 """
 File:   main.py
 Author: Koutounidis Christos-Angelos
-Description: Main call file for the program
+Description: Main call file for the program. Without arguments it starts the GUI game, like
+             before. The other commands run the headless modes, and only import what they need
+             so that they start quickly.
 """
 
-# Creating an random Frozen Lake environment
-FL_Environment = RandomFrozenLake()
-FL_Environment.play_game()
+# Maximum time (seconds) that "import RandomFrozenLake" may take in a fresh interpreter
+IMPORT_TIME_BUDGET = 0.5
+# Packages that the core must only load lazily
+HEAVY_MODULES = ("pygame", "cv2", "mss", "scipy", "win32gui")
 
-# Printing the initial random map
-print("Initial Random Map:")
-FL_Environment.render()
+
+def open_recorder(args):
+    """
+    TrajectoryRecorder of the --record file, or None
+    """
+    if getattr(args, "record", None) is None:
+        return None
+    from Trajectory_Recorder import TrajectoryRecorder
+    return TrajectoryRecorder(args.record)
+
+
+def make_monitor(args):
+    """
+    ConvergenceMonitor of the --stable, --q-tol and --plateau options, or None
+    """
+    stable, q_tolerance, plateau = (getattr(args, name, None) for name in ("stable", "q_tol", "plateau"))
+    if stable is None and q_tolerance is None and plateau is None:
+        return None
+    from Convergence import ConvergenceMonitor
+    return ConvergenceMonitor(stable, q_tolerance, plateau, getattr(args, "plateau_tol", 0.5))
+
+
+def add_convergence_arguments(command):
+    command.add_argument("--stable", type=int, metavar="K", help="converged when the policy doesn't change for K episodes")
+    command.add_argument("--q-tol", type=float, metavar="EPS", help="converged when max |ΔQ| of an episode is below EPS")
+    command.add_argument("--plateau", type=int, metavar="W", help="converged when the mean reward of W episodes stops moving")
+    command.add_argument("--plateau-tol", type=float, default=0.5, help="reward change of the plateau (0.5 by default)")
+
+
+def play(args):
+    from RandomFrozenLake import RandomFrozenLake
+    # Creating an random Frozen Lake environment
+    FL_Environment = RandomFrozenLake(seed=getattr(args, "seed", None), recorder=open_recorder(args))
+    FL_Environment.play_game(background=getattr(args, "background", False),
+                             planning_steps=getattr(args, "planning", 0), dynamic=getattr(args, "dynamic", False),
+                             convergence=make_monitor(args), stop_on_convergence=getattr(args, "stop", False),
+                             policy_source=getattr(args, "policy_source", "solver"),
+                             turbo=getattr(args, "turbo", False), target_fps=getattr(args, "fps", 40))
+
+    # Printing the initial random map
+    print("Initial Random Map:")
+    FL_Environment.render()
+
+
+def train(args):
+    from RandomFrozenLake import RandomFrozenLake
+    from Q_Learner import QLearner, load_settings
+
+    settings = load_settings()[args.slip]
+    env = RandomFrozenLake(n=args.n, seed=args.seed, recorder=open_recorder(args))
+    env.slip = args.slip
+    env.gamma = settings["gamma"]
+    env.alpha = settings["alpha"]
+    env.holes = env.generate_holes()
+    env.compile_model()
+    learner = QLearner(env, settings["gamma"], settings["alpha"], settings["bonus"], kernel=args.kernel,
+                       planning_steps=args.planning)
+    if args.policy_source == "solver":
+        # The exact solver's Q-values, as the GUI agent is seeded
+        learner.seed_from_values(env.solver_best_moves())
+
+    monitor = make_monitor(args)
+    start = time.perf_counter()
+    if args.live:
+        from Terminal_Renderer import train_live
+        rewards = train_live(learner, args.episodes, monitor=monitor)
+    else:
+        rewards = learner.train(args.episodes, monitor=monitor)
+    elapsed = time.perf_counter() - start
+    print("\nInitial Random Map:")
+    env.render()
+    env.print_best_actions_grid()
+    last = rewards[-min(100, len(rewards)):]
+    if monitor is not None:
+        print(monitor.report())
+    print(f"{len(rewards)} episodes in {elapsed:.2f} s, mean reward of the last {len(last)}: {last.mean():.2f}")
+    if env.recorder is not None:
+        env.recorder.close()
+        print(len(env.recorder), "transitions recorded to", args.record)
+
+
+def farm(args):
+    from Training_Farm import make_jobs, run_farm, merge_results
+
+    jobs = make_jobs(args.maps, args.seeds, tuple(args.slips), args.seed)
+    results = []
+    for result in run_farm(jobs, args.episodes, args.workers, patience=args.patience, early_stop=args.early_stop):
+        results.append(result)
+        print(f"job {result['job_id']:>5} ({len(results)}/{len(jobs)}): slip {result['slip']}, "
+              f"success {result['successes'].mean():.2f}, converged at {result['episodes_to_convergence']}")
+    merge_results(results, args.output)
+    print("Results written to", args.output)
+
+
+def sweep(args):
+    from Hyperparameter_Sweep import sweep as run_sweep, save_tuned_defaults
+
+    table = run_sweep(tuple(args.slips), args.maps, args.configs, args.seed, args.policy_source,
+                      min_episodes=args.min_episodes, max_episodes=args.max_episodes)
+    for slip, settings in table.items():
+        print(f"slip {slip}: {settings}")
+    if args.output:
+        save_tuned_defaults(table, args.output)
+    else:
+        save_tuned_defaults(table)
+
+
+def maps(args):
+    from Map_Generator import write_map_dataset
+
+    write_map_dataset(args.output, args.count, args.n, args.slip, args.seed)
+    print(args.count, "maps written to", args.output)
+
+
+def offline(args):
+    import numpy as np
+    from Offline_Learner import OfflineLearner
+
+    learner = OfflineLearner(args.n, args.gamma, args.alpha)
+    start = time.perf_counter()
+    for path in args.logs:
+        learner.add_file(path)
+    sweeps = learner.fit(args.sweeps, args.tol)
+    elapsed = time.perf_counter() - start
+    print(f"{learner.transitions} transitions, {sweeps} sweeps in {elapsed:.2f} s")
+    np.savez(args.output, Q=learner.Q, policy=learner.greedy_policy())
+    print("Q-table and policy written to", args.output)
+
+
+def bench(args):
+    from Benchmark_Suite import main as run_benchmarks
+    return run_benchmarks(args.options)
+
+
+def measure_import(repeats=3):
+    """
+    Times "import RandomFrozenLake" in fresh interpreters.
+    Returns the best time (seconds) and the GUI/vision/solver packages it imported.
+    """
+    code = ("import sys, time; start = time.perf_counter(); import RandomFrozenLake; "
+            "print(time.perf_counter() - start); "
+            f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    here = os.path.dirname(os.path.abspath(__file__))
+    timings = []
+    heavy = ""
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", code], cwd=here, capture_output=True, text=True, check=True)
+        elapsed, heavy = (output.stdout.splitlines() + [""])[:2]
+        timings.append(float(elapsed))
+    return min(timings), heavy.split()
+
+
+def check_import(args):
+    """
+    Measures "import RandomFrozenLake" in a fresh interpreter and fails if it takes longer than
+    the budget, or if it imports any of the GUI/vision/solver packages
+    """
+    best, heavy = measure_import(args.repeats)
+    print(f"import RandomFrozenLake: {best * 1000:.1f} ms (budget {args.budget * 1000:.0f} ms)")
+    if heavy:
+        print("FAIL: the core imported", " ".join(heavy))
+        return 1
+    if best > args.budget:
+        print("FAIL: over the import time budget")
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Random Frozen Lake")
+    commands = parser.add_subparsers(dest="command")
+
+    command = commands.add_parser("play", help="GUI game (default)")
+    command.add_argument("--seed", type=int, help="same map and episodes for the same seed")
+    command.add_argument("--record", help="append the played transitions to this file")
+    command.add_argument("--policy-source", choices=("solver", "analyzer"), default="solver",
+                         help="initial best moves: exact solver or visual analyzer on a screenshot")
+    command.add_argument("--background", action="store_true", help="the agent learns in a separate process (not with --record)")
+    command.add_argument("--turbo", action="store_true", help="as many learning steps per frame as fit into it")
+    command.add_argument("--fps", type=int, default=40, help="frames per second of the agent's game")
+    command.add_argument("--planning", type=int, default=0, help="prioritized sweeping backups per real step")
+    command.add_argument("--dynamic", action="store_true", help="click to melt/freeze holes, right click moves the goal")
+    add_convergence_arguments(command)
+    command.add_argument("--stop", action="store_true", help="end the game when the learning converges (instead of evaluating)")
+    command.set_defaults(function=play)
+
+    command = commands.add_parser("train", help="headless Q-learning on a random map")
+    command.add_argument("--n", type=int, help="grid size (random in [5, 22] by default)")
+    command.add_argument("--slip", type=int, choices=(0, 1, 2), default=0)
+    command.add_argument("--episodes", type=int, default=1000)
+    command.add_argument("--seed", type=int)
+    command.add_argument("--policy-source", choices=("solver", "zero"), default="solver")
+    command.add_argument("--record", help="append the played transitions to this file")
+    command.add_argument("--kernel", action="store_true", help="Numba-compiled episodes (if numba is installed)")
+    command.add_argument("--planning", type=int, default=0, help="prioritized sweeping backups per real step")
+    command.add_argument("--live", action="store_true", help="live view of the policy in the terminal (ANSI)")
+    add_convergence_arguments(command)
+    command.set_defaults(function=train)
+
+    command = commands.add_parser("farm", help="multi-process training over maps and seeds")
+    command.add_argument("--maps", type=int, default=8)
+    command.add_argument("--seeds", type=int, default=4)
+    command.add_argument("--slips", type=int, nargs="+", default=[0, 1, 2])
+    command.add_argument("--episodes", type=int, default=500)
+    command.add_argument("--workers", type=int)
+    command.add_argument("--patience", type=int, default=50, help="converged when the policy doesn't change for this many episodes")
+    command.add_argument("--early-stop", action="store_true", help="every job ends as soon as its policy converges")
+    command.add_argument("--seed", type=int, default=0)
+    command.add_argument("--output", default="farm_results.npz")
+    command.set_defaults(function=farm)
+
+    command = commands.add_parser("sweep", help="successive halving sweep of the per-slip settings")
+    command.add_argument("--slips", type=int, nargs="+", default=[0, 1, 2])
+    command.add_argument("--maps", type=int, default=8)
+    command.add_argument("--configs", type=int, default=32)
+    command.add_argument("--min-episodes", type=int, default=20)
+    command.add_argument("--max-episodes", type=int, default=640)
+    command.add_argument("--policy-source", choices=("solver", "zero"), default="solver",
+                         help="initialization of the learners (solver: the one of the GUI agent)")
+    command.add_argument("--seed", type=int, default=0)
+    command.add_argument("--output", help="table of tuned defaults (tuned_defaults.json by default)")
+    command.set_defaults(function=sweep)
+
+    command = commands.add_parser("maps", help="write a dataset of solvable maps")
+    command.add_argument("output", help='".npz" (compressed) or ".npy" (memory-mapped) file')
+    command.add_argument("--count", type=int, default=100000)
+    command.add_argument("--n", type=int)
+    command.add_argument("--slip", type=int, choices=(0, 1, 2))
+    command.add_argument("--seed", type=int)
+    command.set_defaults(function=maps)
+
+    command = commands.add_parser("offline", help="batch Q-learning from recorded transitions")
+    command.add_argument("logs", nargs="+", help="files written with --record")
+    command.add_argument("--n", type=int, required=True, help="grid size of the recorded map")
+    command.add_argument("--gamma", type=float, default=0.95)
+    command.add_argument("--alpha", type=float, default=0.5)
+    command.add_argument("--sweeps", type=int, default=10000)
+    command.add_argument("--tol", type=float, default=1e-6)
+    command.add_argument("--output", default="offline_q.npz")
+    command.set_defaults(function=offline)
+
+    command = commands.add_parser("bench", help="benchmark suite (other options are passed to Benchmark_Suite.py)")
+    command.set_defaults(function=bench)
+
+    command = commands.add_parser("check-import", help="enforce the import time budget of the core")
+    command.add_argument("--budget", type=float, default=IMPORT_TIME_BUDGET)
+    command.add_argument("--repeats", type=int, default=3)
+    command.set_defaults(function=check_import)
+
+    args, options = parser.parse_known_args(argv)
+    if args.command == "bench":
+        args.options = options
+    elif options:
+        parser.error("unrecognized arguments: " + " ".join(options))
+    function = getattr(args, "function", play)
+    return function(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
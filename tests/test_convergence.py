@@ -0,0 +1,53 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Convergence
+from Convergence import ConvergenceMonitor
+
+"""
+File:   test_convergence.py
+Author: Koutounidis Christos-Angelos
+Description: The episodes and the seconds to convergence of the ConvergenceMonitor refer to the
+             same point of the training (the clock advances 1 s per episode).
+"""
+
+
+class EpisodeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+
+def run_monitor(monitor, policies, monkeypatch):
+    clock = EpisodeClock()
+    monkeypatch.setattr(Convergence, "time", clock)
+    Q = np.zeros((4, 4), dtype=np.float32)
+    monitor.start(policies[0], Q)
+    for policy in policies:
+        clock.now += 1
+        if monitor.update(policy, Q, 0.0):
+            break
+    return monitor
+
+
+def test_policy_criterion_time_matches_episodes(monkeypatch):
+    # The policy changes in episodes 2 and 4, then stays the same
+    policies = [np.array(p) for p in ([1, 0, 0, 0], [1, 0, 0, 0], [2, 0, 0, 0])] + [np.array([2, 0, 0, 0])] * 20
+    monitor = run_monitor(ConvergenceMonitor(stable_episodes=5), [np.zeros(4, dtype=int)] + policies, monkeypatch)
+    assert monitor.criterion == "policy"
+    assert monitor.episodes_to_convergence == 4
+    assert monitor.seconds_to_convergence == 4.0
+    assert monitor.detected_after == 9
+    assert monitor.seconds_to_detection == 9.0
+
+
+def test_q_criterion_time_matches_episodes(monkeypatch):
+    policies = [np.zeros(4, dtype=int)] * 10
+    monitor = run_monitor(ConvergenceMonitor(q_tolerance=1e-3), policies, monkeypatch)
+    assert monitor.criterion == "q_values"
+    assert monitor.episodes_to_convergence == monitor.detected_after == 1
+    assert monitor.seconds_to_convergence == monitor.seconds_to_detection == 1.0
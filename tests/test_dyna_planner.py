@@ -0,0 +1,56 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from RandomFrozenLake import RandomFrozenLake
+from Q_Learner import QLearner, load_settings
+from VectorFrozenLake import HOLE_REWARD
+
+"""
+File:   test_dyna_planner.py
+Author: Koutounidis Christos-Angelos
+Description: The planner's backups weigh the seeded Q-values against the observed outcomes, and
+             with the same seeds the planning agent reaches the goal in at least as many real
+             episodes as the plain Q-learner.
+"""
+
+
+def make_learner(map_seed, slip, planning_steps):
+    settings = load_settings()[slip]
+    env = RandomFrozenLake(n=10, seed=map_seed)
+    env.slip = slip
+    env.gamma = settings["gamma"]
+    env.holes = env.generate_holes()
+    env.compile_model()
+    learner = QLearner(env, settings["gamma"], settings["alpha"], settings["bonus"], planning_steps=planning_steps)
+    learner.seed_from_values(env.solver_best_moves())
+    env.seed_dynamics(100 + map_seed)
+    return learner
+
+
+def test_one_slip_into_a_hole_does_not_replace_the_seeded_value():
+    learner = make_learner(0, 1, 20)
+    planner = learner.planner
+    state, action = 0, int(learner.policy[0])
+    seeded = float(learner.Q[state, action])
+    hole = int(np.flatnonzero(learner.env.holes)[0])
+    assert not learner.Q[hole].any()
+    # The REAL action lands in the hole (whatever the map around the start)
+    planner.next_state[state][action] = hole
+    learner.update(state, action, HOLE_REWARD, hole)
+    planner.observe(state, action, action, HOLE_REWARD)
+    planner.plan()
+    k = planner.prior_visits
+    assert np.isclose(learner.Q[state, action], (k * seeded + HOLE_REWARD) / (k + 1), rtol=1e-6)
+
+
+def test_planning_does_not_regress_goals_per_real_episode():
+    goals = {0: 0, 20: 0}
+    for map_seed in range(8):
+        for planning_steps in goals:
+            learner = make_learner(map_seed, 1, planning_steps)
+            for _ in range(100):
+                learner.run_episode(1000)
+                goals[planning_steps] += learner.reached_goal
+    assert goals[20] >= goals[0]
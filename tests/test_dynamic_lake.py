@@ -0,0 +1,50 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from RandomFrozenLake import RandomFrozenLake
+from Transition_Model import TransitionModel
+from Policy_Solver import value_iteration
+from Dynamic_Lake import DynamicLake, REPLAN_TOLERANCE
+
+"""
+File:   test_dynamic_lake.py
+Author: Koutounidis Christos-Angelos
+Description: After every change of the dynamic lake, the locally updated model is the same as
+             a full compilation of the new map, and the locally repaired Q-values are those of
+             a full Value Iteration (exactly with a tiny tolerance, closely with the default one).
+"""
+
+
+def random_changes(env, rng, count):
+    """
+    Seeded sequence of melting, freezing and goal moves (never on the start or the goal)
+    """
+    for _ in range(count):
+        cells = [cell for cell in np.ndindex(env.n, env.n) if cell not in (env.start, env.goal)]
+        cell = cells[rng.integers(len(cells))]
+        kind = rng.integers(3)
+        if kind == 2 and not env.holes[cell]:
+            yield "move_goal", cell
+        else:
+            yield ("freeze" if env.holes[cell] else "melt"), [cell]
+
+
+def test_local_replanning_matches_full_solve():
+    for seed, slip, tol, atol in ((0, 0, 1e-9, 1e-6), (1, 1, 1e-9, 1e-6), (2, 2, 1e-9, 1e-6),
+                                  (3, 1, REPLAN_TOLERANCE, 1e-2), (4, 2, REPLAN_TOLERANCE, 1e-2)):
+        env = RandomFrozenLake(n=9, seed=seed)
+        env.slip = slip
+        env.gamma = 0.9
+        env.holes = env.generate_holes()
+        lake = DynamicLake(env, tol=tol)
+        for change, argument in random_changes(env, np.random.default_rng(seed), 25):
+            getattr(lake, change)(argument)
+
+            compiled = TransitionModel.from_env(env)
+            for table in ("terminal", "hole_grid", "next_state", "rewards", "done"):
+                assert np.array_equal(getattr(env.model, table), getattr(compiled, table)), table
+            _, V, Q = value_iteration(env, env.gamma, tol=1e-10)
+            assert np.allclose(lake.Q, Q, atol=atol)
+            assert np.allclose(lake.Q.max(axis=1), V, atol=atol)
@@ -0,0 +1,19 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from main import IMPORT_TIME_BUDGET, measure_import
+
+"""
+File:   test_import_budget.py
+Author: Koutounidis Christos-Angelos
+Description: Enforces the import time budget of the core: "import RandomFrozenLake" in a fresh
+             interpreter stays under IMPORT_TIME_BUDGET and loads none of the GUI/vision/solver
+             packages (the same measurement as "python main.py check-import").
+"""
+
+
+def test_import_budget():
+    best, heavy = measure_import(repeats=3)
+    assert not heavy, f"the core imported {heavy}"
+    assert best < IMPORT_TIME_BUDGET, f"import RandomFrozenLake took {best * 1000:.1f} ms"
@@ -0,0 +1,91 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from RandomFrozenLake import RandomFrozenLake
+from Offline_Learner import OfflineLearner
+from Trajectory_Recorder import TrajectoryRecorder, load_trajectories
+
+"""
+File:   test_offline_learner.py
+Author: Koutounidis Christos-Angelos
+Description: The batched sweeps of the OfflineLearner are the same as averaging the TD targets
+             of the logged transitions one by one, and the fit converges to the Q-values of
+             Value Iteration on the empirical model of the log.
+"""
+
+
+def record_log(path, n, slip, seed, transitions):
+    """
+    Logs random actions from random states (not holes or the goal) of a seeded map
+    """
+    env = RandomFrozenLake(n=n, seed=seed)
+    env.slip = slip
+    env.holes = env.generate_holes()
+    env.compile_model()
+    rng = np.random.default_rng(seed)
+    cells = [cell for cell in np.ndindex(n, n) if not env.holes[cell] and cell != tuple(env.goal)]
+    with TrajectoryRecorder(path, chunk_size=1000) as recorder:
+        for cell, action in zip(rng.integers(0, len(cells), transitions).tolist(),
+                                rng.integers(0, 4, transitions).tolist()):
+            env.state, env.done = cells[cell], False
+            _, reward, done = env.step(action)
+            recorder.record(cells[cell][0] * n + cells[cell][1], action, env.last_action, reward, done)
+    return load_trajectories(path)
+
+
+def empirical_model(records, n, next_state):
+    """
+    Samples of every (state, inputed action) as a list of (reward, next state)
+    """
+    samples = {}
+    for row in records.tolist():
+        state, intended, actual, reward = row[1:5]
+        samples.setdefault((state, intended), []).append((reward, next_state[state][actual]))
+    return samples
+
+
+def test_sweep_matches_per_transition_targets(tmp_path):
+    n, gamma, alpha = 7, 0.9, 0.3
+    records = record_log(str(tmp_path / "log.bin"), n, 1, 2, 3000)
+    initial = np.random.default_rng(0).normal(size=(n * n, 4))
+    learner = OfflineLearner(n, gamma, alpha, initial)
+    # Chunked streaming of the file gives the same statistics as one batch
+    assert learner.add_file(str(tmp_path / "log.bin"), chunk_size=257) == len(records)
+    single = OfflineLearner(n, gamma, alpha, initial)
+    single.add(records)
+    assert np.allclose(learner.counts, single.counts) and np.allclose(learner.reward_sums, single.reward_sums)
+
+    samples = empirical_model(records, n, learner.next_state.tolist())
+    for _ in range(3):
+        expected = learner.Q.copy()
+        V = learner.Q.max(axis=1)
+        for (state, action), outcomes in samples.items():
+            target = np.mean([reward + gamma * V[next_state] for reward, next_state in outcomes])
+            expected[state, action] += alpha * (target - expected[state, action])
+        learner.sweep()
+        assert np.allclose(learner.Q, expected, atol=1e-9)
+
+
+def test_fit_converges_to_value_iteration_of_the_log(tmp_path):
+    n, gamma = 6, 0.9
+    records = record_log(str(tmp_path / "log.bin"), n, 2, 4, 20000)
+    learner = OfflineLearner(n, gamma, 1.0)
+    learner.add_file(str(tmp_path / "log.bin"))
+    learner.fit(tol=1e-10)
+
+    # Dense empirical model: mean reward and distribution of the next states of every logged pair
+    samples = empirical_model(records, n, learner.next_state.tolist())
+    R = np.zeros((n * n, 4))
+    P = np.zeros((n * n, 4, n * n))
+    for (state, action), outcomes in samples.items():
+        for reward, next_state in outcomes:
+            R[state, action] += reward / len(outcomes)
+            P[state, action, next_state] += 1 / len(outcomes)
+    Q = np.zeros((n * n, 4))
+    for _ in range(1000):
+        Q = R + gamma * P @ Q.max(axis=1)
+    assert np.allclose(learner.Q, Q, atol=1e-6)
+    logged = np.unique([state for state, _ in samples])
+    assert np.array_equal(learner.greedy_policy()[logged], Q.argmax(axis=1)[logged])
@@ -0,0 +1,81 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from RandomFrozenLake import RandomFrozenLake
+from VectorFrozenLake import SLIP_PROBABILITIES
+from Policy_Solver import value_iteration, policy_iteration
+
+"""
+File:   test_policy_solver.py
+Author: Koutounidis Christos-Angelos
+Description: The sparse Value and Policy Iteration of Policy_Solver.py give the same Q-values as a
+             dense Value Iteration on the transitions of the reference step().
+"""
+
+
+class FixedDraw:
+    def __init__(self, draw):
+        self.draw = draw
+
+    def random(self):
+        return self.draw
+
+
+def dense_model(env):
+    """
+    Dense P[s, a, s'] and expected rewards R[s, a] from the reference step() (not compiled).
+    The final (END) states have no transitions.
+    """
+    n_states = env.n * env.n
+    probabilities = SLIP_PROBABILITIES[env.slip]
+    draws = np.cumsum(probabilities) - probabilities / 2
+    P = np.zeros((n_states, 4, n_states))
+    R = np.zeros((n_states, 4))
+    terminal = np.zeros(n_states, dtype=bool)
+    for state_index in range(n_states):
+        cell = divmod(state_index, env.n)
+        if env.holes[cell] or cell == env.goal:
+            terminal[state_index] = True
+            continue
+        for action in range(4):
+            for probability, draw in zip(probabilities, draws):
+                if probability == 0:
+                    continue
+                env.state, env.done = cell, False
+                env.slip_draws = FixedDraw(draw)
+                (row, col), reward, _ = env.step(action)
+                P[state_index, action, row * env.n + col] += probability
+                R[state_index, action] += probability * reward
+    return P, R, terminal
+
+
+def dense_value_iteration(P, R, terminal, gamma, tol=1e-10):
+    V = np.zeros(len(R))
+    while True:
+        Q = R + gamma * P @ V
+        Q[terminal] = 0
+        V_new = Q.max(axis=1)
+        if np.max(np.abs(V_new - V)) < tol:
+            return Q
+        V = V_new
+
+
+def test_sparse_solvers_match_dense_value_iteration():
+    for seed, n in ((0, 5), (4, 8), (9, 12)):
+        for slip in (0, 1, 2):
+            env = RandomFrozenLake(n=n, seed=seed)
+            env.slip = slip
+            env.holes = env.generate_holes()
+            gamma = 0.9
+            Q_dense = dense_value_iteration(*dense_model(env), gamma)
+
+            _, V, Q = value_iteration(env, gamma)
+            np.testing.assert_allclose(Q, Q_dense, atol=1e-6)
+            np.testing.assert_allclose(V, Q_dense.max(axis=1), atol=1e-6)
+
+            policy, V_policy, _ = policy_iteration(env, gamma)
+            np.testing.assert_allclose(V_policy, Q_dense.max(axis=1), atol=1e-6)
+            # The policy of Policy Iteration is optimal (ties may pick another action)
+            np.testing.assert_allclose(Q_dense[np.arange(n * n), policy], Q_dense.max(axis=1), atol=1e-6)
@@ -0,0 +1,51 @@
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Random_Stream import RandomStream
+
+"""
+File:   test_random_stream.py
+Author: Koutounidis Christos-Angelos
+Description: Mixed take() / push_back() / random() calls (as the compiled kernel makes them) give
+             the same sequence as plain random() calls, without nesting iterators.
+"""
+
+
+def test_take_and_push_back_keep_the_sequence():
+    reference = RandomStream(np.random.default_rng(5), block_size=64)
+    stream = RandomStream(np.random.default_rng(5), block_size=64)
+    rng = np.random.default_rng(1)
+    expected, drawn = [], []
+    for _ in range(20000):
+        if rng.random() < 0.5:
+            count = int(rng.integers(0, 100))
+            values = stream.take(count)
+            used = int(rng.integers(0, count + 1))
+            stream.push_back(values[used:])
+            drawn.extend(values[:used].tolist())
+            expected.extend(reference.random() for _ in range(used))
+        else:
+            drawn.append(stream.random())
+            expected.append(reference.random())
+    assert drawn == expected
+
+
+def draw_time(stream, count=20000):
+    start = time.perf_counter()
+    for _ in range(count):
+        stream.random()
+    return time.perf_counter() - start
+
+
+def test_push_back_does_not_nest():
+    fresh = RandomStream(np.random.default_rng(0), block_size=1 << 20)
+    stream = RandomStream(np.random.default_rng(0), block_size=1 << 20)
+    fresh.random()
+    stream.random()     # A block is loaded, the pushed back uniforms go in front of its rest
+    for _ in range(5000):
+        stream.push_back(stream.take(10)[1:])
+    # With nested iterators every draw would go through thousands of them
+    assert draw_time(stream) < 10 * draw_time(fresh) + 0.01
@@ -0,0 +1,129 @@
+import io
+import os
+import re
+import sys
+from contextlib import redirect_stdout
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from RandomFrozenLake import RandomFrozenLake
+from Terminal_Renderer import TerminalRenderer, best_actions_text, map_text
+
+"""
+File:   test_terminal_renderer.py
+Author: Koutounidis Christos-Angelos
+Description: The vectorized grids are the same text as the character by character print of
+             the original render() and print_best_actions_grid(), and the frames of the ANSI
+             live mode, changed cells only, leave the same screen as a full redraw.
+"""
+
+
+def reference_render(env):
+    """
+    The original RandomFrozenLake.render()
+    """
+    print(" " + "_" * ((3*env.n)-1))
+    for i in range(env.n):
+        row = "|"
+        for j in range(env.n):
+            if (i, j) == env.state:
+                cell = "P"
+            elif (i, j) == env.goal:
+                cell = "G"
+            elif env.holes[i, j]:
+                cell = "X"
+            else:
+                cell = " "
+            if j == env.n - 1:
+                row += f"{cell} |"
+            else:
+                row += f"{cell}  "
+        print(row)
+    print(" " + "‾" * ((3*env.n)-1))
+
+
+def reference_best_actions_grid(env):
+    """
+    The original RandomFrozenLake.print_best_actions_grid()
+    """
+    action_symbols = ['↑', '←', '↓', '→']  # Up, Left, Down, Right
+    best_actions = np.zeros(env.grid_size, dtype=str)
+    for row in range(env.grid_size[0]):
+        for col in range(env.grid_size[1]):
+            state_index = np.ravel_multi_index((row, col), env.grid_size)
+            best_actions[row, col] = action_symbols[env.best_move_per_cell[state_index]]
+    best_actions[env.goal] = 'G'   # goal
+    best_actions[env.holes.astype(bool)] = 'X'    # holes
+    print("Best actions grid:")
+    for row in range(env.grid_size[0]):
+        print(' '.join(best_actions[row]))
+
+
+def printed(function, env):
+    output = io.StringIO()
+    with redirect_stdout(output):
+        function(env)
+    return output.getvalue()
+
+
+def make_env(n, seed):
+    env = RandomFrozenLake(n=n, seed=seed)
+    env.slip = seed % 3
+    env.holes = env.generate_holes()
+    env.best_move_per_cell[:] = np.random.default_rng(seed).integers(0, 4, n * n).tolist()
+    return env
+
+
+def screen_after(output, rows, cols):
+    """
+    Screen left by the escape sequences of TerminalRenderer (2J, H, row;colH and K)
+    """
+    screen = [[' '] * cols for _ in range(rows)]
+    row = col = 0
+    for token in re.findall(r"\x1b\[[0-9;]*[A-Za-z]|.", output, re.S):
+        if token.startswith("\x1b["):
+            arguments, command = token[2:-1], token[-1]
+            if command == "J":
+                screen = [[' '] * cols for _ in range(rows)]
+            elif command == "H":
+                row, col = [int(x) - 1 for x in arguments.split(";")] if arguments else (0, 0)
+            elif command == "K":
+                screen[row][col:] = [' '] * (cols - col)
+        elif token == "\n":
+            row, col = row + 1, 0
+        else:
+            screen[row][col] = token
+            col += 1
+    return ["".join(line).rstrip() for line in screen]
+
+
+def test_grids_match_original_prints():
+    for n, seed in ((3, 0), (4, 1), (10, 2), (17, 3)):
+        env = make_env(n, seed)
+        for state in (env.start, (n - 1, 0), env.goal):
+            env.state = state
+            assert map_text(env) == printed(reference_render, env)
+        assert "Best actions grid:\n" + best_actions_text(env) == printed(reference_best_actions_grid, env)
+
+
+def test_live_frames_leave_the_full_grid_on_screen():
+    n = 12
+    env = make_env(n, 4)
+    rng = np.random.default_rng(4)
+    output = io.StringIO()
+    renderer = TerminalRenderer(env, stream=output, min_interval=0)
+    renderer.rows, renderer.cols = n, n
+    policy = np.array(env.best_move_per_cell.tolist())
+    for frame in range(30):
+        # A few cells change in most frames, many of them in some (full redraws)
+        changed = rng.integers(0, n * n, 3 if frame % 7 else n * n // 2)
+        policy[changed] = rng.integers(0, 4, len(changed))
+        agent = int(rng.integers(0, n * n))
+        renderer.draw(policy, agent, status=f"frame {frame}")
+
+        full = TerminalRenderer(env, stream=io.StringIO(), min_interval=0)
+        full.rows, full.cols = n, n
+        full.draw(policy, agent, status=f"frame {frame}")
+        expected = screen_after(full.stream.getvalue(), n + 2, 2 * n)
+        assert screen_after(output.getvalue(), n + 2, 2 * n) == expected
+        assert expected[n] == f"frame {frame}"
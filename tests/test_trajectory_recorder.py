@@ -0,0 +1,70 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from RandomFrozenLake import RandomFrozenLake
+from Q_Learner import QLearner
+from Trajectory_Recorder import TrajectoryRecorder, load_trajectories
+
+"""
+File:   test_trajectory_recorder.py
+Author: Koutounidis Christos-Angelos
+Description: The transitions of a seeded training run, recorded through the double buffers and
+             loaded back as a memory-mapped array, are the ones the reference step() of
+             RandomFrozenLake plays with the same seed, and the episodes are numbered in order
+             (also when the recording continues in an existing file).
+"""
+
+
+def make_env(slip, seed, compiled, recorder=None):
+    env = RandomFrozenLake(n=8, seed=seed, recorder=recorder)
+    env.slip = slip
+    env.holes = env.generate_holes()
+    if compiled:
+        env.compile_model()
+    return env
+
+
+def replay(transitions, reference, first_episode=0):
+    """
+    Plays the recorded inputed actions with the reference step and checks every field
+    """
+    episode = first_episode
+    for row in transitions.tolist():
+        state, intended, actual, reward, done = row[1:]
+        assert row[0] == episode
+        assert reference.state[0] * reference.n + reference.state[1] == state
+        next_state, expected_reward, expected_done = reference.step(intended)
+        assert reference.last_action == actual
+        assert np.float32(expected_reward) == np.float32(reward)
+        assert expected_done == done
+        if done:
+            reference.reset()
+            episode += 1
+    return episode
+
+
+def test_recorded_transitions_match_reference_steps(tmp_path):
+    for slip in (0, 1, 2):
+        path = str(tmp_path / f"slip{slip}.bin")
+        # Small buffers, so that the run goes through many swaps of the double buffering
+        recorder = TrajectoryRecorder(path, chunk_size=64)
+        env = make_env(slip, 5, compiled=True, recorder=recorder)
+        QLearner(env, 0.95, 0.4).train(30, max_steps=500)
+        recorder.close()
+
+        transitions = load_trajectories(path)
+        assert len(transitions) == len(recorder) > 64 * 4
+        reference = make_env(slip, 5, compiled=False)
+        episodes = replay(transitions, reference)
+
+        # Recording into the same file continues the episode numbering
+        recorder = TrajectoryRecorder(path, chunk_size=64)
+        assert recorder.episode == episodes
+        env.recorder = recorder
+        env.reset()
+        QLearner(env, 0.95, 0.4).train(5, max_steps=500)
+        recorder.close()
+        reference.reset()
+        replay(load_trajectories(path)[len(transitions):], reference, episodes)
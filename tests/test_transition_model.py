@@ -0,0 +1,37 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from RandomFrozenLake import RandomFrozenLake
+
+"""
+File:   test_transition_model.py
+Author: Koutounidis Christos-Angelos
+Description: The table-lookup step of the compiled TransitionModel plays the same episodes as
+             the reference step() of RandomFrozenLake for the same seed.
+"""
+
+
+def make_env(n, slip, seed, compiled):
+    env = RandomFrozenLake(n=n, seed=seed)
+    env.slip = slip
+    env.holes = env.generate_holes()
+    if compiled:
+        env.compile_model()
+    return env
+
+
+def test_compiled_step_matches_reference_step():
+    for seed, n in ((0, 6), (3, 11), (7, 20)):
+        for slip in (0, 1, 2):
+            reference = make_env(n, slip, seed, compiled=False)
+            compiled = make_env(n, slip, seed, compiled=True)
+            actions = np.random.default_rng(seed).integers(0, 4, size=3000)
+            for action in actions.tolist():
+                expected = reference.step(action)
+                assert compiled.step(action) == expected
+                assert compiled.last_action == reference.last_action
+                if expected[2]:
+                    reference.reset()
+                    compiled.reset()
@@ -0,0 +1,64 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from RandomFrozenLake import RandomFrozenLake
+from VectorFrozenLake import VectorFrozenLake, SLIP_PROBABILITIES
+
+"""
+File:   test_vector_env.py
+Author: Koutounidis Christos-Angelos
+Description: VectorFrozenLake.step() gives the same next state, reward, done flag and REAL action
+             as the reference RandomFrozenLake.step() (not compiled) for every state, inputed
+             action and slip outcome of seeded maps.
+"""
+
+
+class FixedDraws:
+    """
+    Stands in for the random streams: returns the given uniforms
+    """
+    def __init__(self, draws):
+        self.draws = np.asarray(draws, dtype=float)
+
+    def random(self, size=None):
+        return self.draws if size is not None else float(self.draws)
+
+
+def outcome_draws(slip):
+    """
+    One uniform in the middle of the interval of every possible slip outcome
+    """
+    probabilities = SLIP_PROBABILITIES[slip]
+    return (np.cumsum(probabilities) - probabilities / 2)[probabilities > 0]
+
+
+def make_env(n, slip, seed):
+    env = RandomFrozenLake(n=n, seed=seed)
+    env.slip = slip
+    env.holes = env.generate_holes()
+    return env
+
+
+def test_vector_step_matches_reference_step():
+    for seed, n in ((0, 5), (1, 9), (2, 14)):
+        for slip in (0, 1, 2):
+            env = make_env(n, slip, seed)
+            draws = outcome_draws(slip)
+            states, actions, uniforms = (grid.ravel() for grid in np.meshgrid(
+                np.arange(n * n), np.arange(4), draws, indexing="ij"))
+            vector_env = VectorFrozenLake.from_envs([env] * len(states))
+            vector_env.rng = FixedDraws(uniforms)
+            vector_env.rows, vector_env.cols = np.divmod(states, n)
+            next_states, rewards, done = vector_env.step(actions)
+
+            for i, (state_index, action, draw) in enumerate(zip(states.tolist(), actions.tolist(), uniforms.tolist())):
+                env.state = divmod(state_index, n)
+                env.done = False
+                env.slip_draws = FixedDraws(draw)
+                next_state, reward, env_done = env.step(action)
+                assert tuple(next_states[i]) == tuple(next_state)
+                assert rewards[i] == reward
+                assert done[i] == env_done
+                assert vector_env.last_actions[i] == env.last_action
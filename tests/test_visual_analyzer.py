@@ -0,0 +1,78 @@
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import sys
+import numpy as np
+import pygame
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from RandomFrozenLake import RandomFrozenLake
+from Visual_Analyzer import GameAnalyzer
+from Board_Renderer import BoardRenderer
+
+"""
+File:   test_visual_analyzer.py
+Author: Koutounidis Christos-Angelos
+Description: The grid-array calculate_best_moves gives the same best moves as the previous
+             implementation (searches in the lists of positions) on rendered seeded maps.
+"""
+
+
+def reference_best_moves(analyzer, elements):
+    """
+    The previous calculate_best_moves (40 pixel cells), kept as the reference
+    """
+    goal_pos = analyzer.get_positions(elements['goal'])[0]
+    hole_positions = analyzer.get_positions(elements['holes'])
+    combined_positions = elements['available'] + elements['holes'] + elements['player'] + elements['goal']
+    available_positions = analyzer.get_positions(combined_positions)
+
+    directions = {}
+    for position in available_positions:
+        dx = goal_pos[0] - position[0]
+        dy = goal_pos[1] - position[1]
+        up = (position[0], position[1] - 40) in hole_positions or (position[0], position[1] - 40) not in available_positions
+        down = (position[0], position[1] + 40) in hole_positions or (position[0], position[1] + 40) not in available_positions
+        left = (position[0] - 40, position[1]) in hole_positions or (position[0] - 40, position[1]) not in available_positions
+        right = (position[0] + 40, position[1]) in hole_positions or (position[0] + 40, position[1]) not in available_positions
+        all_free = not (up or down or left or right)
+        if abs(dx) > abs(dy):
+            if all_free:
+                direction = 3 if dx >= 0 else 1
+            elif dx >= 0:
+                direction = 3 if not right else (2 if not down else (0 if not up else 1))
+            else:
+                direction = 1 if not left else (2 if not down else (0 if not up else 3))
+        else:
+            if all_free:
+                direction = 2 if dy >= 0 else 0
+            elif dy >= 0:
+                direction = 2 if not down else (3 if not right else (1 if not left else 0))
+            else:
+                direction = 0 if not up else (3 if not right else (1 if not left else 2))
+        directions[position] = direction
+
+    deltas = {0: (0, -40), 1: (-40, 0), 2: (0, 40), 3: (40, 0)}
+    for _ in range(4):
+        for pos, move_dir in directions.items():
+            adj_pos = (pos[0] + deltas[move_dir][0], pos[1] + deltas[move_dir][1])
+            if adj_pos in available_positions and adj_pos not in hole_positions:
+                if abs(move_dir - directions[adj_pos]) == 2:
+                    directions[pos] = move_dir + 1 if move_dir != 3 else 0
+    return directions
+
+
+def test_best_moves_match_previous_implementation():
+    pygame.init()
+    rng = np.random.default_rng(0)
+    for seed in range(12):
+        env = RandomFrozenLake(n=int(rng.integers(5, 15)), seed=seed)
+        env.slip = seed % 3
+        env.holes = env.generate_holes()
+        screen = pygame.display.set_mode(((env.n * 40) + 40, (env.n * 40 + 2) + 40))
+        BoardRenderer(screen, env, 40).draw()
+        analyzer = GameAnalyzer(env.n, 40)
+        elements = analyzer.find_elements(np.ascontiguousarray(pygame.surfarray.array3d(screen).transpose(1, 0, 2)))
+        best_moves = analyzer.calculate_best_moves(elements)
+        assert len(best_moves) == env.n * env.n
+        assert best_moves == reference_best_moves(analyzer, elements)
+    pygame.quit()